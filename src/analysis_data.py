@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pickle
+import pandas as pd
+
+OUTPUT_DIR = "data"
+ANALYSIS_FILE = f"{OUTPUT_DIR}/language_analysis.csv"
+
+# Parsed frames are cached here as pickles, one per csv file
+CACHE_DIR = f"{OUTPUT_DIR}/.analysis_cache"
+
+# Category of every language in an analysis file
+NATURAL = 'natural'
+OPTIMAL_ARTIFICIAL = 'optimal_artificial'
+FIRST_GEN_ARTIFICIAL = 'first_gen_artificial'
+CATEGORIES = [NATURAL, OPTIMAL_ARTIFICIAL, FIRST_GEN_ARTIFICIAL]
+
+# Column types of analysis files (other columns, e.g. avg_ms_complexity_<prior>, are parsed by pandas)
+ANALYSIS_DTYPES = {
+    'language': str,
+    'type': str,
+    'lexicon': 'int64',
+    'grammar': 'int64',
+    'lexicon_grammar': 'int64',
+    'avg_ms_complexity': 'float64',
+}
+
+# Frames already loaded in this process, by absolute path
+_loaded = {}
+
+def file_key(path):
+    """Returns the (absolute path, modification time, size) that identifies a version of a file."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+def cache_path(path, cache_dir=CACHE_DIR):
+    """Returns the cache file of a csv file."""
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    return f"{cache_dir}/{digest}.pkl"
+
+def read_csv_cached(path, parse=pd.read_csv, cache_dir=CACHE_DIR):
+    """
+    Returns parse(path), e.g. a DataFrame. The result is cached in memory and in a pickle in cache_dir together
+    with the file's key (see file_key) and the pandas version, so the csv file is only parsed again after it
+    changes. Unreadable cache files are ignored, and if cache_dir cannot be written (e.g. a read-only checkout)
+    the result is only cached in memory. Returns a copy, so callers can modify it.
+    """
+    key = file_key(path)
+    if key[0] in _loaded and _loaded[key[0]][0] == key:
+        return _loaded[key[0]][1].copy()
+
+    cache_file = cache_path(path, cache_dir)
+    frame = None
+    if os.path.exists(cache_file):
+        # Pickles written by another pandas version can fail in many ways (e.g. ImportError, AttributeError)
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, cached_version, cached_frame = pickle.load(f)
+            if cached_key == key and cached_version == pd.__version__:
+                frame = cached_frame
+        except Exception:
+            pass
+
+    if frame is None:
+        frame = parse(path)
+        # Write to a temporary file first, so concurrent readers never see a partial cache file
+        temporary_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(temporary_file, 'wb') as f:
+                pickle.dump((key, pd.__version__, frame), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_file, cache_file)
+        except OSError:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+    _loaded[key[0]] = (key, frame)
+    return frame.copy()
+
+def add_categories(df):
+    """
+    Sets the category column (natural, optimal_artificial or first_gen_artificial) of an analysis DataFrame if
+    it has none. analyse_languages writes the column. For older files, it is derived from the row order:
+    natural languages, then the optimal artificial languages, then the first generation, which starts at the
+    second artificial_language_g0_0 row (or the only one). Without such a row, all artificial languages count
+    as optimal.
+    """
+    if 'category' not in df:
+        category = pd.Series(OPTIMAL_ARTIFICIAL, index=df.index)
+        category[df['type'] != 'artificial'] = NATURAL
+        first_gen_positions = (df['language'] == 'artificial_language_g0_0').to_numpy().nonzero()[0]
+        if len(first_gen_positions):
+            first_gen_start = first_gen_positions[1] if len(first_gen_positions) > 1 else first_gen_positions[0]
+            category.iloc[first_gen_start:] = FIRST_GEN_ARTIFICIAL
+        df['category'] = category
+    df['category'] = pd.Categorical(df['category'], categories=CATEGORIES)
+    return df
+
+def parse_analysis(path):
+    """Parses an analysis csv file with typed columns and a category column."""
+    df = pd.read_csv(path, dtype={column: dtype for column, dtype in ANALYSIS_DTYPES.items()})
+    return add_categories(df)
+
+def read_analysis(path=ANALYSIS_FILE):
+    """Reads an analysis (or prior complexity) csv file through the cache. See parse_analysis."""
+    return read_csv_cached(path, parse_analysis)
+
+def split_languages(df):
+    """Returns the natural, optimal artificial and first generation artificial languages of an analysis DataFrame."""
+    if 'category' not in df:
+        df = add_categories(df.copy())
+    return (df[df['category'] == NATURAL], df[df['category'] == OPTIMAL_ARTIFICIAL],
+            df[df['category'] == FIRST_GEN_ARTIFICIAL])
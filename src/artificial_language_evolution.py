@@ -1,27 +1,58 @@
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import argparse
+import gzip
+import json
+import os
+import pickle
+import random
+import resource
+import time
+import numpy as np
 import pandas as pd
 
-# Paths to the other scripts
-GENERATION_SCRIPT = "src/artificial_language_generation.py"
-HURFORD_GRAMMAR_SCRIPT = "src/hurford_grammar.py"
-COMPLEXITY_ANALYSIS_SCRIPT = "src/complexity_analysis.py"
+import artificial_language_generation
+import hurford_grammar
+import complexity_analysis
+from analysis_data import OPTIMAL_ARTIFICIAL
+from construction_cache import ConstructionCache
+from expression_table import ExpressionTable
+from grammar import NUMBERS, read_grammars, write_grammars
 
 # Number of generations (100)
 NUM_GENERATIONS = 100
 
+# Write the surviving population to ARTIFICIAL_LANGUAGE_FILE every CHECKPOINT_INTERVAL generations
+CHECKPOINT_INTERVAL = 10
+
 # Artificial language files
 OUTPUT_DIR = "data"
 ARTIFICIAL_LANGUAGE_FILE = f"{OUTPUT_DIR}/artificial_language_grammars.csv"
 REV_PL_ART_LANG_FILE = f"{OUTPUT_DIR}/rev_pl_artificial_language_grammars.csv"
 UNI_ART_LANG_FILE = f"{OUTPUT_DIR}/uniform_artificial_language_grammars.csv"
 
-HURFORD_OUTPUT_FILE = f"{OUTPUT_DIR}/language_specific_constructions.csv"
+FIRST_GEN_ART_LANG_FILE = f"{OUTPUT_DIR}/first_gen_artificial_language_grammars.csv"
+NATURAL_GRAMMAR_FILE = f"{OUTPUT_DIR}/natural_language_grammars.csv"
+
 COMPLEXITY_OUTPUT_FILE = f"{OUTPUT_DIR}/language_analysis.csv"
 
-def run_script(script, *args):
-    """Run a Python script with optional arguments."""
-    command = ["python", script] + list(args)
-    subprocess.run(command, check=True)
+# State of evolve_population after the last finished generation (see write_checkpoint)
+CHECKPOINT_FILE = f"{OUTPUT_DIR}/evolution_checkpoint.pkl.gz"
+
+# Per-generation metrics of evolve_population, one JSON object per line (see generation_telemetry)
+TELEMETRY_FILE = f"{OUTPUT_DIR}/evolution_telemetry.jsonl"
+
+# Number of worker processes used to generate constructions
+NUM_WORKERS = 1
+
+# Format of the final constructions file: csv, npz (columnar, see construction_store.py) or both
+CONSTRUCTION_OUTPUT_FORMAT = 'csv'
+
+# Island model (see evolve_islands): number of islands (one worker process each), number of generations
+# between migrations, and the seed of island 0's random number generator (island k uses ISLAND_SEED + k)
+NUM_ISLANDS = 4
+MIGRATION_INTERVAL = 10
+ISLAND_SEED = 0
 
 def is_more_optimal(lang1, lang2):
     """Determine if lang1 is more optimal than lang2 based on defined criteria."""
@@ -39,67 +70,351 @@ def is_more_optimal(lang1, lang2):
     return False
 
 def select_optimal_languages(languages_df):
-    """Select the most optimal languages from the population using a DataFrame."""
-    optimal_languages = []
-    seen_criteria = set()
-
-    for index, lang in languages_df.iterrows():
-        # Skip if already seen this combination
-        # criteria = (lang['lexicon'], lang['avg_ms_complexity'], lang['grammar'])
-        criteria = (lang['lexicon'], lang['avg_ms_complexity'])
-        if criteria in seen_criteria:
-            continue
-
-        # Check if the language is optimal
-        if all(
-            other_index == index or not is_more_optimal(other, lang)  # Skip self-comparison
-            for other_index, other in languages_df.iterrows()
-        ):
-            optimal_languages.append(lang['language'])
-            seen_criteria.add(criteria)
+    """
+    Select the most optimal languages from the population using a DataFrame.
+    A language is kept if no other language is more optimal (see is_more_optimal), i.e. it has the
+    lowest complexity among languages of its lexicon size and the smallest lexicon among languages
+    of its complexity. Only the first language with a given (lexicon, complexity) is kept.
+    Both minima are computed by grouping with np.unique, so this is O(n log n).
+    """
+    sizes = languages_df['lexicon'].to_numpy(dtype=float)
+    complexities = languages_df['avg_ms_complexity'].to_numpy(dtype=float)
+
+    # Lowest complexity for each lexicon size (fmin ignores NaN, which is never more optimal)
+    size_keys, size_groups = np.unique(sizes, return_inverse=True)
+    min_complexities = np.full(len(size_keys), np.nan)
+    np.fmin.at(min_complexities, size_groups, complexities)
+
+    # Smallest lexicon for each complexity
+    complexity_keys, complexity_groups = np.unique(complexities, return_inverse=True)
+    min_sizes = np.full(len(complexity_keys), np.nan)
+    np.fmin.at(min_sizes, complexity_groups, sizes)
+
+    is_optimal = ~(complexities > min_complexities[size_groups]) & ~(sizes > min_sizes[complexity_groups])
 
+    # Skip languages whose (lexicon, avg_ms_complexity) has already been selected
+    # criteria = (lang['lexicon'], lang['avg_ms_complexity'], lang['grammar'])
+    optimal_indices = np.flatnonzero(is_optimal)
+    criteria = pd.DataFrame({'lexicon': sizes[optimal_indices], 'avg_ms_complexity': complexities[optimal_indices]})
+    optimal_indices = optimal_indices[~criteria.duplicated().to_numpy()]
+
+    optimal_languages = languages_df['language'].iloc[optimal_indices].tolist()
     print(optimal_languages)
     return optimal_languages
 
 def keep_optimal_artificial(artificial_grammars, optimal_languages):
     """Filter the artificial grammars to retain only optimal ones."""
-    filtered_df = artificial_grammars[artificial_grammars['language'].isin(optimal_languages)]
-    return filtered_df
+    optimal_languages = set(optimal_languages)
+    return [grammar for grammar in artificial_grammars if grammar.language in optimal_languages]
+
+def generation_telemetry(generation, stage_times, num_generated, population, language_constructions,
+                         artificial_languages, optimal_languages, cache=None, cache_hits=0, expressions=None):
+    """
+    Returns the metrics of one generation as a dict: wall time per stage, number of new languages
+    (mutants and random languages), number of languages evaluated and read from the construction cache,
+    number of ERR constructions in the population, frontier size, best avg_ms_complexity per lexicon
+    size and peak RSS of the process so far (in MB). expressions is the node table of the constructions.
+    """
+    if expressions is None:
+        expressions = hurford_grammar.EXPRESSIONS
+    err = expressions.leaf(hurford_grammar.ERR)
+    population_constructions = language_constructions['language'].isin(population)
+    best_complexities = artificial_languages.groupby('lexicon')['avg_ms_complexity'].min()
+    return {
+        'generation': generation,
+        'stage_times': stage_times,
+        'total_time': sum(stage_times.values()),
+        'generated': num_generated,
+        'evaluated': len(artificial_languages),
+        'cached': cache.hits - cache_hits if cache is not None else 0,
+        'err_constructions': int((language_constructions['constructions'][population_constructions] == err).sum()),
+        'frontier_size': len(optimal_languages),
+        'best_complexity_by_lexicon': {str(lexicon): complexity for lexicon, complexity in best_complexities.items()},
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def write_checkpoint(path, generation, num_generations, artificial_language_grammars, first_gen_art_lang_grammars):
+    """
+    Atomically writes the state of evolve_population after a generation: the next generation to run,
+    the number of generations of the run, the surviving population, the first generation and the state
+    of the random number generator. The checkpoint is written to a temporary file that then replaces
+    path, so a crash while writing leaves the previous checkpoint intact.
+    """
+    checkpoint = {
+        'generation': generation,
+        'num_generations': num_generations,
+        'grammars': artificial_language_grammars,
+        'first_gen': first_gen_art_lang_grammars,
+        'random_state': random.getstate(),
+    }
+    temporary_path = f"{path}.tmp"
+    with gzip.open(temporary_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+def read_checkpoint(path=CHECKPOINT_FILE):
+    """Reads a checkpoint written by write_checkpoint."""
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+def evolve_population(num_generations=NUM_GENERATIONS, checkpoint_interval=CHECKPOINT_INTERVAL,
+                      telemetry_file=TELEMETRY_FILE, checkpoint_file=CHECKPOINT_FILE, checkpoint=None):
+    """
+    Perform evolutionary optimization across multiple generations. The population is carried
+    between the generation, construction, analysis and selection steps in memory, and is only
+    written to disk at checkpoints and after the last generation.
+    After every generation, the state of the run is written to checkpoint_file (None to disable).
+    If a checkpoint (see read_checkpoint) is given, the run continues from it up to num_generations.
+    Metrics of every generation are written to telemetry_file as JSON lines (None to disable).
+    """
+    natural_language_grammars = read_grammars(NATURAL_GRAMMAR_FILE)
+    cache = ConstructionCache() if hurford_grammar.USE_CACHE else None
+    # Construction traces of the population, so mutants only rebuild the numbers their mutation affects. The
+    # traces and constructions refer to nodes of this run's table, which is freed when the run ends.
+    traces = {}
+    expressions = ExpressionTable()
+    first_gen_art_lang_grammars = None
+    artificial_language_grammars = None
+    first_generation = 0
+    if checkpoint is not None:
+        first_generation = checkpoint['generation']
+        artificial_language_grammars = checkpoint['grammars']
+        first_gen_art_lang_grammars = checkpoint['first_gen']
+        random.setstate(checkpoint['random_state'])
+    if first_generation >= num_generations:
+        print(f"The run already finished generation {num_generations - 1}.")
+        return artificial_language_grammars
+    telemetry = open(telemetry_file, 'a' if checkpoint is not None else 'w') if telemetry_file else None
 
-def evolve_population():
-    """Perform evolutionary optimization across multiple generations."""
-    for generation in range(0, NUM_GENERATIONS):
+    for generation in range(first_generation, num_generations):
         print(f"Starting generation {generation}...")
+        stage_times = {}
+        cache_hits = cache.hits if cache is not None else 0
+        num_survivors = len(artificial_language_grammars) if artificial_language_grammars is not None else 0
 
         # Step 1: Generate artificial languages
-        run_script(GENERATION_SCRIPT, str(generation))
+        start = time.perf_counter()
+        artificial_language_grammars = artificial_language_generation.generate_population(generation, artificial_language_grammars)
+        if generation == 0:
+            first_gen_art_lang_grammars = list(artificial_language_grammars)
+            write_grammars(first_gen_art_lang_grammars, FIRST_GEN_ART_LANG_FILE)
+        stage_times['generate'] = time.perf_counter() - start
         print(f"Generated artificial languages for generation {generation}.")
 
         # Step 2: Generate Hurford number constructions
-        is_last_gen = generation == NUM_GENERATIONS - 1
-        run_script(HURFORD_GRAMMAR_SCRIPT, str(is_last_gen))
+        start = time.perf_counter()
+        is_last_gen = generation == num_generations - 1
+        language_constructions = hurford_grammar.construct_generation(artificial_language_grammars, is_last_gen,
+                                                                      natural_language_grammars, first_gen_art_lang_grammars,
+                                                                      NUM_WORKERS, cache, traces,
+                                                                      expressions=expressions)
+        stage_times['construct'] = time.perf_counter() - start
         print(f"Generated Hurford number constructions for generation {generation}.")
 
         # Step 3: Perform complexity analysis and select optimal languages
-        run_script(COMPLEXITY_ANALYSIS_SCRIPT)
+        start = time.perf_counter()
+        if is_last_gen:
+            language_complexities = complexity_analysis.analyse_languages(language_constructions, artificial_language_grammars,
+                                                                          natural_language_grammars, first_gen_art_lang_grammars)
+        else:
+            language_complexities = complexity_analysis.analyse_languages(language_constructions, artificial_language_grammars)
+        stage_times['analyse'] = time.perf_counter() - start
         print(f"Performed complexity analysis for generation {generation}.")
 
-        # Read optimal languages from the output file
-        language_complexities = pd.read_csv(COMPLEXITY_OUTPUT_FILE)
-        language_complexities['is_artificial'] = language_complexities['language'].str.startswith('artificial_language')
-
-        # Separate data for plotting
-        artificial_languages = language_complexities[language_complexities['is_artificial']]
+        # Only the current population competes in selection
+        start = time.perf_counter()
+        population = [grammar.language for grammar in artificial_language_grammars]
+        artificial_languages = language_complexities[language_complexities['language'].isin(population)]
         optimal_languages = select_optimal_languages(artificial_languages)
-        artificial_language_grammars = pd.read_csv(ARTIFICIAL_LANGUAGE_FILE)
 
         artificial_language_grammars = keep_optimal_artificial(artificial_language_grammars, optimal_languages)
-        print(artificial_language_grammars)
-        artificial_language_grammars.to_csv(ARTIFICIAL_LANGUAGE_FILE, index=False)
-        
+        traces = {grammar.language: traces[grammar.language] for grammar in artificial_language_grammars
+                  if grammar.language in traces}
+        stage_times['select'] = time.perf_counter() - start
+        print(f"Kept {len(artificial_language_grammars)} optimal languages in generation {generation}.")
+        start = time.perf_counter()
+        if checkpoint_file:
+            write_checkpoint(checkpoint_file, generation + 1, num_generations, artificial_language_grammars,
+                             first_gen_art_lang_grammars)
+        if checkpoint_interval and (generation + 1) % checkpoint_interval == 0:
+            write_grammars(artificial_language_grammars, ARTIFICIAL_LANGUAGE_FILE)
+        stage_times['checkpoint'] = time.perf_counter() - start
+
+        if telemetry is not None:
+            record = generation_telemetry(generation, stage_times, len(population) - num_survivors, population,
+                                          language_constructions, artificial_languages, optimal_languages,
+                                          cache, cache_hits, expressions)
+            telemetry.write(json.dumps(record) + "\n")
+            telemetry.flush()
+
+    # Write data to csv files
+    write_grammars(artificial_language_grammars, ARTIFICIAL_LANGUAGE_FILE)
+    hurford_grammar.write_constructions(language_constructions, CONSTRUCTION_OUTPUT_FORMAT, expressions)
+    if cache is not None:
+        print(f"Construction cache: {cache.hits} hits, {cache.misses} misses.")
+        cache.close()
+    language_complexities.to_csv(COMPLEXITY_OUTPUT_FILE, index=False)
+    if telemetry is not None:
+        telemetry.close()
+    return artificial_language_grammars
+
+def resume_population(extra_generations=0, checkpoint_file=CHECKPOINT_FILE):
+    """
+    Continues the run saved in checkpoint_file where it stopped. With extra_generations, a finished
+    (or unfinished) run is extended by that many generations.
+    """
+    checkpoint = read_checkpoint(checkpoint_file)
+    num_generations = checkpoint['num_generations'] + extra_generations
+    print(f"Resuming at generation {checkpoint['generation']} of {num_generations}.")
+    return evolve_population(num_generations, checkpoint_file=checkpoint_file, checkpoint=checkpoint)
+
+class Island:
+    """
+    State of one island in the island model: its index, the next generation to run, the surviving
+    population, its first generation, and the state of its random number generator.
+    """
+    __slots__ = ('index', 'generation', 'grammars', 'first_gen', 'random_state')
+
+    def __init__(self, index, random_state):
+        self.index = index
+        self.generation = 0
+        self.grammars = None
+        self.first_gen = None
+        self.random_state = random_state
+
+def evolve_island(island, num_generations):
+    """
+    Worker process function. Runs num_generations generations (generate, construct, analyse, select)
+    on the island and returns it. Constructions are cached in memory for the duration of the call.
+    """
+    random.setstate(island.random_state)
+    cache = ConstructionCache(":memory:") if hurford_grammar.USE_CACHE else None
+    traces = {}
+    expressions = ExpressionTable()
+
+    for _ in range(num_generations):
+        generation = island.generation
+        artificial_language_grammars = artificial_language_generation.generate_population(generation, island.grammars,
+                                                                                           island.index)
+        if generation == 0:
+            island.first_gen = list(artificial_language_grammars)
+
+        language_constructions = hurford_grammar.construct_generation(artificial_language_grammars, cache=cache,
+                                                                      traces=traces, expressions=expressions)
+        language_complexities = complexity_analysis.analyse_languages(language_constructions, artificial_language_grammars)
+        optimal_languages = select_optimal_languages(language_complexities)
+
+        island.grammars = keep_optimal_artificial(artificial_language_grammars, optimal_languages)
+        traces = {grammar.language: traces[grammar.language] for grammar in island.grammars
+                  if grammar.language in traces}
+        island.generation += 1
+        print(f"Island {island.index}: kept {len(island.grammars)} optimal languages in generation {generation}.")
+
+    if cache is not None:
+        cache.close()
+    island.random_state = random.getstate()
+    return island
+
+def merge_populations(populations):
+    """Concatenates populations, skipping languages whose name was already added."""
+    merged = []
+    names = set()
+    for population in populations:
+        for grammar in population:
+            if grammar.language not in names:
+                names.add(grammar.language)
+                merged.append(grammar)
+    return merged
+
+def migrate(islands):
+    """Every island receives the current non-dominated languages of all other islands."""
+    frontiers = [list(island.grammars) for island in islands]
+    for island in islands:
+        island.grammars = merge_populations([island.grammars] + [frontier for k, frontier in enumerate(frontiers)
+                                                                 if k != island.index])
+
+def evolve_islands(num_islands=NUM_ISLANDS, num_generations=NUM_GENERATIONS, migration_interval=MIGRATION_INTERVAL,
+                   seed=ISLAND_SEED):
+    """
+    Island model: num_islands populations evolve independently in worker processes, and every
+    migration_interval generations each island receives the others' non-dominated languages.
+    Afterwards, the merged frontier of all islands is selected and written to the same files as
+    evolve_population (the analysis contains natural languages, the merged frontier and the first
+    generation of every island).
+    """
+    islands = [Island(k, random.Random(seed + k).getstate()) for k in range(num_islands)]
+
+    generation = 0
+    with ProcessPoolExecutor(max_workers=num_islands) as executor:
+        while generation < num_generations:
+            epoch = min(migration_interval, num_generations - generation)
+            islands = list(executor.map(evolve_island, islands, repeat(epoch)))
+            generation += epoch
+            print(f"Finished generation {generation - 1} on {num_islands} islands.")
+
+            write_grammars(merge_populations([island.grammars for island in islands]), ARTIFICIAL_LANGUAGE_FILE)
+            if generation < num_generations:
+                migrate(islands)
+
+    # Select the merged frontier and analyse it together with the natural and first generation languages
+    artificial_language_grammars = merge_populations([island.grammars for island in islands])
+    first_gen_art_lang_grammars = merge_populations([island.first_gen for island in islands])
+    natural_language_grammars = read_grammars(NATURAL_GRAMMAR_FILE)
+    write_grammars(first_gen_art_lang_grammars, FIRST_GEN_ART_LANG_FILE)
+
+    cache = ConstructionCache() if hurford_grammar.USE_CACHE else None
+    expressions = ExpressionTable()
+    language_constructions = hurford_grammar.construct_generation(artificial_language_grammars, True,
+                                                                  natural_language_grammars, first_gen_art_lang_grammars,
+                                                                  NUM_WORKERS, cache, expressions=expressions)
+    if cache is not None:
+        cache.close()
+    language_complexities = complexity_analysis.analyse_languages(language_constructions, artificial_language_grammars,
+                                                                  natural_language_grammars, first_gen_art_lang_grammars)
+    population = {grammar.language for grammar in artificial_language_grammars}
+    optimal_languages = set(select_optimal_languages(language_complexities[language_complexities['language'].isin(population)]))
+
+    # Drop the dominated languages of the merged population only. First generation languages can have the same
+    # names (an island's first generation survives into its population), so they are told apart by category
+    # in the analysis and by position in the constructions, where construct_generation puts the population first.
+    dominated = population - optimal_languages
+    num_population_rows = len(artificial_language_grammars) * len(NUMBERS)
+    artificial_language_grammars = keep_optimal_artificial(artificial_language_grammars, optimal_languages)
+    is_dominated = ((language_complexities['category'] == OPTIMAL_ARTIFICIAL) &
+                    language_complexities['language'].isin(dominated))
+    language_complexities = language_complexities[~is_dominated]
+    is_dominated = ((np.arange(len(language_constructions)) < num_population_rows) &
+                    language_constructions['language'].isin(dominated).to_numpy())
+    language_constructions = language_constructions[~is_dominated]
+
+    write_grammars(artificial_language_grammars, ARTIFICIAL_LANGUAGE_FILE)
+    hurford_grammar.write_constructions(language_constructions, CONSTRUCTION_OUTPUT_FORMAT, expressions)
+    language_complexities.to_csv(COMPLEXITY_OUTPUT_FILE, index=False)
+    return artificial_language_grammars
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Evolve artificial languages.")
+    parser.add_argument('islands', nargs='?', type=int,
+                        help="number of islands (evolve_islands). Without it, a single population is evolved.")
+    parser.add_argument('--generations', type=int,
+                        help=f"number of generations of a new run (default {NUM_GENERATIONS})")
+    parser.add_argument('--resume', action='store_true', help=f"continue the run saved in {CHECKPOINT_FILE}")
+    parser.add_argument('--extend', type=int, metavar='N',
+                        help=f"continue the run saved in {CHECKPOINT_FILE} for N more generations")
+    args = parser.parse_args(args)
+    if (args.resume or args.extend is not None) and args.generations is not None:
+        parser.error("--generations cannot be combined with --resume or --extend (use --extend N for more generations)")
+    num_generations = NUM_GENERATIONS if args.generations is None else args.generations
 
-def main():
-    evolve_population()
+    if args.islands is not None:
+        if args.resume or args.extend is not None:
+            parser.error("--resume and --extend are only supported for a single population")
+        evolve_islands(args.islands, num_generations)
+    elif args.resume or args.extend is not None:
+        resume_population(args.extend or 0)
+    else:
+        evolve_population(num_generations)
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,9 @@
+import argparse
 import random
-import pandas as pd
-import sys
 import copy
 
+from grammar import UPPER_BOUND, Grammar, read_grammars, write_grammars
+
 # Max number of digits, bases, and monomorphemics for an artificial language
 MAX_DIGITS = 20
 MAX_NUM_BASES = 5
@@ -36,7 +37,7 @@ def generate_bases(digits):
     # Must include number after last digit as a base, otherwise, impossible to construct 
     # all numbers in range (without subtraction)
     bases = [digits[-1] + 1]
-    numbers = list(range(1, 100))
+    numbers = list(range(1, UPPER_BOUND))
     numbers = [x for x in numbers if x not in digits]
     num = random.randint(0, MAX_NUM_BASES - 1)
     for i in range(num):
@@ -48,7 +49,7 @@ def generate_bases(digits):
 def generate_monomorphemics(digits, bases):
     monomorphemics = []
     num = random.randint(0, MAX_MONOMORPHEMICS)
-    numbers = list(range(1, 100))
+    numbers = list(range(1, UPPER_BOUND))
     numbers = [x for x in numbers if x not in digits]
     numbers = [x for x in numbers if x not in bases]
     monomorphemics = random.sample(numbers, num)
@@ -60,12 +61,16 @@ def generate_multiplication_rule(bases):
     for i in range(1, len(bases)):
         multiplication_rule.append([[bases[i-1], bases[i]], bases[i-1]])
     
-    multiplication_rule.append([[bases[-1], 100], bases[-1]])    
+    multiplication_rule.append([[bases[-1], UPPER_BOUND], bases[-1]])    
     return multiplication_rule
 
 def generate_add_sub_rule(digits, bases, addition_rule):
-    subtraction_rule = []
     max_sub = random.choice(digits) + 1
+    return add_sub_rule(bases, addition_rule, max_sub)
+
+def add_sub_rule(bases, addition_rule, max_sub):
+    """Returns the addition rule and the subtraction rule (between the first two bases) for max_sub."""
+    subtraction_rule = []
     subtraction_rule.append([[bases[0], bases[1]], max_sub])
 
     max_add = bases[0] - max_sub + 1
@@ -84,8 +89,12 @@ def update_bases(bases):
     return new_bases
 
 def generate_exceptions(digits, bases):
-    exceptions = []
     num_exceptions = random.randint(1, len(bases))
+    return base_exceptions(bases, num_exceptions)
+
+def base_exceptions(bases, num_exceptions):
+    """Returns exceptions that construct the first num_exceptions bases as (1 * base)."""
+    exceptions = []
     for i in range(num_exceptions):
         if i < len(bases) - 1:
             exceptions.append([bases[i], [bases[i], bases[i + 1]], f'(1 * {bases[i]})'])
@@ -187,7 +196,7 @@ def mutate_bases(digits, bases, monomorphemic, curr_bases, number_addition_maxs,
             exceptions = generate_exceptions(digits, bases)
   
     elif mutation_subtype == 1:
-        numbers = list(range(1, 100))
+        numbers = list(range(1, UPPER_BOUND))
         numbers = [x for x in numbers if x not in digits]
         numbers = [x for x in numbers if x not in bases]
         numbers = [x for x in numbers if x not in monomorphemic]
@@ -206,9 +215,9 @@ def mutate_bases(digits, bases, monomorphemic, curr_bases, number_addition_maxs,
             exceptions = generate_exceptions(digits, bases)
 
     else:
-        numbers = list(range(1, 100))
+        numbers = list(range(1, UPPER_BOUND))
         if number_subtraction_maxs:
-            numbers = list(range(bases[1] + 1, 100))
+            numbers = list(range(bases[1] + 1, UPPER_BOUND))
         numbers = [x for x in numbers if x not in digits]
         numbers = [x for x in numbers if x not in bases]
         numbers = [x for x in numbers if x not in monomorphemic]
@@ -243,7 +252,7 @@ def mutate_monomorphemics(digits, bases, monomorphemic):
         monomorphemic.remove(remove_value)
     elif mutation_subtype == 1:
         change_index = random.randint(0, len(monomorphemic) - 1)
-        numbers = list(range(1, 100))
+        numbers = list(range(1, UPPER_BOUND))
         numbers = [x for x in numbers if x not in digits]
         numbers = [x for x in numbers if x not in bases]
         numbers = [x for x in numbers if x not in monomorphemic]
@@ -251,7 +260,7 @@ def mutate_monomorphemics(digits, bases, monomorphemic):
         monomorphemic[change_index] = new_monomorphemic
         monomorphemic.sort()
     else:
-        numbers = list(range(1, 100))
+        numbers = list(range(1, UPPER_BOUND))
         numbers = [x for x in numbers if x not in digits]
         numbers = [x for x in numbers if x not in bases]
         numbers = [x for x in numbers if x not in monomorphemic]
@@ -287,23 +296,25 @@ def mutate_exceptions(bases, exceptions):
     
     return exceptions
 
-def mutate(generation, language, language_grammars):
+def mutate(generation, language, island=None):
     """Mutate the artificial language.
        Possible mutations:
        1. Editing digits (delete, add)
        2. Editing bases (delete, change, add)
        3. Editing monomorphemics (delete, change, add)
        4. Editing exceptions constraint (delete, change, add)
+       The parent grammar is left unchanged. If island is given, it is added to the name, since
+       migrants can be mutated on several islands in the same generation.
     """
     mutation_type = random.randint(0, 3)
-    name = language['language']
-    digits = eval(language['digits'])
-    bases = eval(language['bases'])
-    monomorphemic = eval(language['monomorphemics'])
-    curr_bases = eval(language['curr_bases'])
-    number_addition_maxs = eval(language['number_addition_max'])
-    number_subtraction_maxs = eval(language['number_subtraction_max'])
-    exceptions = eval(language['exceptions'])
+    name = language.language
+    digits = copy.deepcopy(language.digits)
+    bases = copy.deepcopy(language.bases)
+    monomorphemic = copy.deepcopy(language.monomorphemics)
+    curr_bases = copy.deepcopy(language.curr_bases)
+    number_addition_maxs = copy.deepcopy(language.number_addition_max)
+    number_subtraction_maxs = copy.deepcopy(language.number_subtraction_max)
+    exceptions = copy.deepcopy(language.exceptions)
 
     if mutation_type == 0:
         digits, bases, curr_bases, number_addition_maxs, number_subtraction_maxs, exceptions = mutate_digits(digits, bases, number_addition_maxs, number_subtraction_maxs, exceptions)
@@ -315,14 +326,16 @@ def mutate(generation, language, language_grammars):
         exceptions = mutate_exceptions(bases, exceptions)
 
     name = f"{name}_m{generation}"
-    new_row = pd.DataFrame([[name, digits, bases, monomorphemic, curr_bases,
-                             number_addition_maxs, number_subtraction_maxs, [],
-                             exceptions]],
-                           columns=language_grammars.columns)
-    return new_row
+    if island is not None:
+        name = f"{name}i{island}"
+    return Grammar(name, digits, bases, monomorphemic, curr_bases,
+                   number_addition_maxs, number_subtraction_maxs, [],
+                   exceptions, parent=language.language)
 
-def generate_language(idx, generation, language_grammars):
+def generate_language(idx, generation, island=None):
     name = f"artificial_language_g{generation}_{idx}"
+    if island is not None:
+        name = f"artificial_language_i{island}_g{generation}_{idx}"
     # Generate lexicon
     digits = generate_digits()
     bases = generate_bases(digits)
@@ -346,34 +359,45 @@ def generate_language(idx, generation, language_grammars):
     if has_exception:
         exceptions = generate_exceptions(digits, bases)
     
-    new_row = pd.DataFrame([[name, digits, bases, monomorphemics, multiplication_rule,
-                             addition_rule, num_sub_rule, phrase_sub_rule,
-                             exceptions]],
-                           columns=language_grammars.columns)
-    language_grammars = pd.concat([language_grammars, new_row], ignore_index=True)
-    return language_grammars
+    return Grammar(name, digits, bases, monomorphemics, multiplication_rule,
+                   addition_rule, num_sub_rule, phrase_sub_rule,
+                   exceptions)
 
-def main():
-    generation = int(sys.argv[1])
+def generate_population(generation, language_grammars=None, island=None):
+    """
+    Generates the artificial languages for a generation. The first generation is generated from scratch,
+    later generations mutate every language in language_grammars and add new random languages.
+    island is the index of the island the population lives on in the island model (see
+    artificial_language_evolution.py), which keeps the names of different islands apart.
+    """
     is_first_gen = not generation
     if is_first_gen:
-        language_grammars = pd.DataFrame(columns=["language","digits","bases","monomorphemics","curr_bases","number_addition_max",
-                                                "number_subtraction_max","phrase_subtraction","exceptions"])
+        language_grammars = []
         for i in range(FIRST_GEN_NUM_LANGUAGES):
-            language_grammars = generate_language(i, generation, language_grammars)
-        language_grammars.to_csv(FIRST_GEN_ART_LANG_FILE, index=False)
+            language_grammars.append(generate_language(i, generation, island))
     else:
-        language_grammars = pd.read_csv(ARTIFICIAL_LANGUAGE_FILE)
-        nrows = language_grammars.shape[0]
-        for i in range(nrows):
-            language = language_grammars.iloc[i]
-            mutated_language = mutate(generation, language, language_grammars)
-            language_grammars = pd.concat([language_grammars, mutated_language], ignore_index=True)
+        language_grammars = list(language_grammars)
+        for language in list(language_grammars):
+            language_grammars.append(mutate(generation, language, island))
         for i in range(NEXT_GEN_NUM_LANGUAGES):
-            language_grammars = generate_language(i, generation, language_grammars)
+            language_grammars.append(generate_language(i, generation, island))
+    return language_grammars
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate or mutate a generation of artificial languages.")
+    parser.add_argument('generation', type=int,
+                        help=f"generation number. 0 generates the first generation from scratch, later generations "
+                             f"mutate the languages in {ARTIFICIAL_LANGUAGE_FILE}")
+    generation = parser.parse_args(args).generation
+    is_first_gen = not generation
+    if is_first_gen:
+        language_grammars = generate_population(generation)
+        write_grammars(language_grammars, FIRST_GEN_ART_LANG_FILE)
+    else:
+        language_grammars = generate_population(generation, read_grammars(ARTIFICIAL_LANGUAGE_FILE))
 
     # Write data to csv file
-    language_grammars.to_csv(ARTIFICIAL_LANGUAGE_FILE, index=False)
+    write_grammars(language_grammars, ARTIFICIAL_LANGUAGE_FILE)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,162 @@
+import contextlib
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import pandas as pd
+
+import artificial_language_evolution
+import artificial_language_generation
+import complexity_analysis
+import generate_plots
+import hurford_grammar
+from expression_table import ExpressionTable
+from grammar import NUMBERS
+
+OUTPUT_DIR = "data"
+BENCHMARK_OUTPUT_FILE = f"{OUTPUT_DIR}/benchmarks.jsonl"
+
+# Number of grammars in the synthetic corpus, and how often each benchmark is repeated (the best time counts)
+CORPUS_SIZE = 300
+REPEATS = 5
+
+# Seed of the synthetic corpus, so every commit is benchmarked on the same grammars
+CORPUS_SEED = 0
+
+def make_corpus(size=CORPUS_SIZE, seed=CORPUS_SEED):
+    """
+    Builds a synthetic corpus of size grammars with the artificial language generators: half are random
+    languages and half are mutants of them, like a generation of the evolution.
+    """
+    random.seed(seed)
+    num_random = size - size // 2
+    grammars = [artificial_language_generation.generate_language(i, 0) for i in range(num_random)]
+    for i in range(size // 2):
+        grammars.append(artificial_language_generation.mutate(1, grammars[i % num_random]))
+    return grammars
+
+def make_analysis(grammars):
+    """
+    Constructs and analyses the corpus. Returns the constructions (rendered to strings) and the language
+    analysis DataFrames. The constructions are built in their own node table, so hurford_grammar.EXPRESSIONS
+    stays empty for the benchmarks.
+    """
+    expressions = ExpressionTable()
+    language_constructions = hurford_grammar.generate_languages(grammars, expressions=expressions)
+    language_complexities = complexity_analysis.analyse_languages(language_constructions, grammars)
+    return hurford_grammar.render_constructions(language_constructions, expressions), language_complexities
+
+def time_function(function, repeats=REPEATS):
+    """Calls function repeats times (with its output suppressed) and returns the best and mean wall time."""
+    times = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+def bench_generate_numbers(grammars):
+    # Every repeat interns its nodes into a new table, so no repeat is timed with a warm table
+    def run():
+        expressions = ExpressionTable()
+        for grammar in grammars:
+            digits, bases, monomorphemics = grammar.lexicon()
+            hurford_grammar.generate_numbers(NUMBERS, digits, bases, monomorphemics, grammar.curr_bases,
+                                             grammar.number_addition_max, grammar.number_subtraction_max,
+                                             grammar.phrase_subtraction, grammar.exceptions,
+                                             expressions=expressions)
+    return run
+
+def bench_in_ranges(grammars):
+    ranges = [rule[0] for grammar in grammars for rule in grammar.curr_bases + grammar.number_addition_max]
+    ranges += [exception[1] for grammar in grammars for exception in grammar.exceptions]
+    def run():
+        for rule_range in ranges:
+            for number in NUMBERS:
+                hurford_grammar.in_ranges(number, rule_range)
+    return run
+
+def bench_avg_ms_complexity(language_constructions):
+    constructions = [group['constructions'] for _, group in language_constructions.groupby('language', sort=False)]
+    def run():
+        for language in constructions:
+            complexity_analysis.calculate_avg_ms_complexity(language)
+    return run
+
+def bench_select_optimal_languages(language_complexities):
+    return lambda: artificial_language_evolution.select_optimal_languages(language_complexities)
+
+def bench_pareto_frontier(language_complexities):
+    return lambda: generate_plots.calculate_pareto_frontier(language_complexities, 'lexicon', 'avg_ms_complexity')
+
+def bench_generation(grammars):
+    # One generation of evolve_population without the disk cache: mutate the survivors, construct,
+    # analyse and select. Like evolve_population, every repeat starts with a new node table.
+    def run():
+        random.seed(CORPUS_SEED)
+        population = artificial_language_generation.generate_population(1, grammars)
+        language_constructions = hurford_grammar.construct_generation(population, traces={},
+                                                                      expressions=ExpressionTable())
+        language_complexities = complexity_analysis.analyse_languages(language_constructions, population)
+        artificial_language_evolution.select_optimal_languages(language_complexities)
+    return run
+
+def git_commit():
+    """Returns the current commit hash (with a -dirty suffix if there are uncommitted changes), or 'unknown'."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ("-dirty" if status.strip() else "")
+
+def run_benchmarks(size=CORPUS_SIZE, repeats=REPEATS):
+    """Runs every benchmark on a synthetic corpus of the given size and returns one result dict per benchmark."""
+    grammars = make_corpus(size)
+    language_constructions, language_complexities = make_analysis(grammars)
+    benchmarks = {
+        'generate_numbers': bench_generate_numbers(grammars),
+        'in_ranges': bench_in_ranges(grammars),
+        'calculate_avg_ms_complexity': bench_avg_ms_complexity(language_constructions),
+        'select_optimal_languages': bench_select_optimal_languages(language_complexities),
+        'calculate_pareto_frontier': bench_pareto_frontier(language_complexities),
+        'generation': bench_generation(grammars),
+    }
+
+    commit = git_commit()
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results = []
+    for name, function in benchmarks.items():
+        best, mean = time_function(function, repeats)
+        results.append({'benchmark': name, 'commit': commit, 'timestamp': timestamp, 'corpus_size': size,
+                        'numbers': len(NUMBERS), 'repeats': repeats, 'best_s': best, 'mean_s': mean,
+                        'python': platform.python_version()})
+        print(f"{name}: best {best:.4f} s, mean {mean:.4f} s")
+    return results
+
+def write_results(results, path=BENCHMARK_OUTPUT_FILE):
+    """Appends results as JSON lines, so runs of different commits can be compared."""
+    with open(path, 'a') as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+
+def compare_results(path=BENCHMARK_OUTPUT_FILE):
+    """Returns a benchmark x commit table of the best times recorded in path (latest run per commit)."""
+    results = pd.read_json(path, lines=True)
+    results = results.drop_duplicates(['benchmark', 'commit', 'corpus_size'], keep='last')
+    return results.pivot_table(index=['benchmark', 'corpus_size'], columns='commit', values='best_s', sort=False)
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    # Optional command-line arguments: corpus size and number of repeats
+    size = int(args[0]) if len(args) > 0 else CORPUS_SIZE
+    repeats = int(args[1]) if len(args) > 1 else REPEATS
+    write_results(run_benchmarks(size, repeats))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+import argparse
+import functools
+import os
+import numpy as np
 import pandas as pd
 
+from grammar import NUMBERS, read_grammars
+from construction_store import count_tokens, read_constructions_npz
+
 OUTPUT_DIR = "data"
 NATURAL_GRAMMAR_PATH = f"{OUTPUT_DIR}/natural_language_grammars.csv"
 ARTIFICIAL_LANGUAGE_FILE = f"{OUTPUT_DIR}/artificial_language_grammars.csv"
@@ -11,13 +18,21 @@ UNI_FIRST_GEN_ART_LANG_FILE = f"{OUTPUT_DIR}/uni_first_gen_artificial_language_g
 FIRST_GEN_ART_LANG_FILE = f"{OUTPUT_DIR}/first_gen_artificial_language_grammars.csv"
 
 CONSTRUCTION_PATH = f"{OUTPUT_DIR}/language_specific_constructions.csv"
+CONSTRUCTION_NPZ_PATH = f"{OUTPUT_DIR}/language_specific_constructions.npz"
 
 # Change this to whichever file you want the complexity calculations to go
 COMPLEXITY_OUTPUT_FILE = f"{OUTPUT_DIR}/language_analysis.csv" 
 
-prior_power_sum = 0
-for i in range(1,100):
-  prior_power_sum += i**(-2)
+# Exponent of the power law priors
+POWER_LAW_EXPONENT = 2
+
+@functools.lru_cache()
+def prior_power_sum(numbers=NUMBERS, exponent=POWER_LAW_EXPONENT):
+    """Normalising constant of the power law priors over the numbers constructions are generated for."""
+    power_sum = 0
+    for i in numbers:
+        power_sum += i**(-exponent)
+    return power_sum
 
 def calculate_lexicon(digits, bases, monomorphemics):
     lexicon_size = len(digits) + len(bases) + len(monomorphemics)
@@ -48,113 +63,166 @@ def calculate_grammar(curr_bases, num_addition, num_subtraction, phrase_subtract
     #         grammar_size += 1
     return grammar_size
 
-# Function to calculate the average morphosyntactic complexity
-def calculate_avg_ms_complexity(constructions):
-    def probaf(number):
-        return (number**(-2)) / prior_power_sum
-    def rev_probaf(number):
-        return ((100 - number)**(-2)) / prior_power_sum
-    def uni_probaf(number):
-        return 1.0 / 99.0
-    
-    constructions_list = constructions.tolist()
-    total = 0
-    for i in range(len(constructions_list)):
-        total += len(str(constructions_list[i]).split()) * probaf(i + 1)
-        #total += len(str(constructions_list[i]).split()) * rev_probaf(i + 1)
-        #total += len(str(constructions_list[i]).split()) * uni_probaf(i + 1)
-    return total
-
-def main():
-    # Read language-specifics from file
-    natural_language_grammars = pd.read_csv(NATURAL_GRAMMAR_PATH)
-    artificial_language_grammars = pd.read_csv(ARTIFICIAL_LANGUAGE_FILE)
-    first_gen_language_grammars = pd.read_csv(FIRST_GEN_ART_LANG_FILE)
-    all_language_constructions = pd.read_csv(CONSTRUCTION_PATH)
-
-    language_analysis = pd.DataFrame(columns=['language', 'type', 'lexicon', 'grammar', 'lexicon_grammar', 'avg_ms_complexity'])
+# Priors take the number and the range of numbers they are normalised over (by default grammar.NUMBERS)
+def probaf(number, numbers=NUMBERS, exponent=POWER_LAW_EXPONENT):
+    return (number**(-exponent)) / prior_power_sum(numbers, exponent)
+def rev_probaf(number, numbers=NUMBERS, exponent=POWER_LAW_EXPONENT):
+    return ((numbers.stop - number)**(-exponent)) / prior_power_sum(numbers, exponent)
+def uni_probaf(number, numbers=NUMBERS):
+    return 1.0 / len(numbers)
 
-    
-    nrows = natural_language_grammars.shape[0]
-    for i in range(nrows):
-        language = natural_language_grammars.iloc[i]
-        
-        # Read each column
-        name = language['language']
-        type = language['type']
+# Priors that avg_ms_complexity can be calculated with, by name
+PRIORS = {
+    'pl': probaf,
+    'rev_pl': rev_probaf,
+    'uni': uni_probaf,
+}
 
-        # Lexicon
-        digits = set(eval(language['digits']))
-        bases = set(eval(language['bases']))
-        monomorphemics = set(eval(language['monomorphemics']))
+# Prior used for the avg_ms_complexity column (and therefore for selection during evolution)
+DEFAULT_PRIOR = 'pl'
 
-        # Grammar
-        curr_bases = eval(language['curr_bases'])
-        num_addition = eval(language['number_addition_max'])
-        num_subtraction = eval(language['number_subtraction_max'])
-        phrase_subtraction = eval(language['phrase_subtraction'])
-        exceptions = eval(language['exceptions'])
+# Function to calculate the average morphosyntactic complexity
+def calculate_avg_ms_complexity(constructions, prior=probaf):
+    token_counts = [count_tokens(construction) for construction in constructions.tolist()]
+    return calculate_avg_ms_complexity_from_tokens(token_counts, prior)
 
-        lexicon_size = calculate_lexicon(digits, bases, monomorphemics)
-        grammar_size = calculate_grammar(curr_bases, num_addition, num_subtraction, phrase_subtraction, exceptions)
-        language_analysis = pd.concat([language_analysis, pd.DataFrame([[name, type, lexicon_size, grammar_size, lexicon_size + grammar_size, 0]], 
-                                                columns=language_analysis.columns)], ignore_index=True)
-    
-    nrows = artificial_language_grammars.shape[0]
-    for i in range(nrows):
-        language = artificial_language_grammars.iloc[i]
-        
-        # Read each column
-        name = language['language']
+def calculate_avg_ms_complexity_from_tokens(token_counts, prior=probaf):
+    numbers = range(1, len(token_counts) + 1)
+    total = 0
+    for i in range(len(token_counts)):
+        total += token_counts[i] * prior(i + 1, numbers)
+    return total
 
+def prior_weights(prior=probaf, numbers=NUMBERS):
+    """Returns the prior probabilities of the numbers as a vector."""
+    return np.array([prior(number, numbers) for number in numbers])
+
+def prior_weight_matrix(priors, numbers=NUMBERS):
+    """Returns a numbers x priors matrix with the weights of the named priors as columns."""
+    return np.column_stack([prior_weights(PRIORS[prior], numbers) for prior in priors])
+
+def power_law_weight_matrix(exponents, numbers=NUMBERS):
+    """
+    Returns a numbers x exponents matrix whose columns are the power law priors number**(-exponent),
+    normalised over numbers. Exponent 0 is the uniform prior and POWER_LAW_EXPONENT is probaf.
+    """
+    values = np.arange(numbers.start, numbers.stop, numbers.step, dtype=float)
+    weights = values[:, None] ** -np.asarray(exponents, dtype=float)[None, :]
+    return weights / weights.sum(axis=0)
+
+def frequency_weight_matrix(frequencies, numbers=NUMBERS):
+    """
+    Returns a numbers x priors matrix from a frequency table: a DataFrame with a number column and one
+    column of (unnormalised) frequencies per prior. Numbers missing from the table get weight 0, and
+    every column is normalised over numbers. Also returns the names of the priors. Raises a ValueError
+    if a prior has no positive total frequency over numbers.
+    """
+    priors = [column for column in frequencies.columns if column != 'number']
+    table = frequencies.set_index('number')[priors].reindex(list(numbers)).fillna(0)
+    weights = table.to_numpy(dtype=float)
+    totals = weights.sum(axis=0)
+    for prior, total in zip(priors, totals):
+        if not total > 0:
+            raise ValueError(f"Prior {prior} has no positive frequencies for the numbers "
+                             f"{numbers.start} to {numbers.stop - 1}")
+    return weights / totals, priors
+
+def token_count_matrix(all_language_constructions, numbers=NUMBERS):
+    """
+    Builds a languages x numbers matrix of construction token counts from a constructions DataFrame
+    (with a constructions or tokens column). Returns the language of every row and the matrix.
+    If a language has constructions more than once, the last ones are used.
+    """
+    if 'tokens' in all_language_constructions:
+        tokens = all_language_constructions['tokens'].to_numpy()
+    else:
+        tokens = all_language_constructions['constructions'].astype(str).str.split().str.len().to_numpy()
+    language_ids, languages = pd.factorize(all_language_constructions['language'])
+    columns = all_language_constructions['number'].to_numpy(dtype=np.int64) - numbers.start
+
+    token_counts = np.zeros((len(languages), len(numbers)))
+    token_counts[language_ids, columns] = tokens
+    return languages, token_counts
+
+def read_language_constructions():
+    """
+    Reads the constructions of all languages. The columnar store is preferred if hurford_grammar.py wrote one
+    that is at least as new as the csv file. Only the token counts are read from it, not the construction strings.
+    """
+    if os.path.exists(CONSTRUCTION_NPZ_PATH) and (not os.path.exists(CONSTRUCTION_PATH) or
+                                                  os.path.getmtime(CONSTRUCTION_NPZ_PATH) >= os.path.getmtime(CONSTRUCTION_PATH)):
+        return read_constructions_npz(CONSTRUCTION_NPZ_PATH)
+    return pd.read_csv(CONSTRUCTION_PATH)
+
+def analyse_languages(all_language_constructions, artificial_language_grammars,
+                      natural_language_grammars=None, first_gen_language_grammars=None, priors=(),
+                      numbers=NUMBERS, language_token_counts=None):
+    """
+    Calculates lexicon size, grammar size and avg_ms_complexity for the given languages.
+    Natural and first generation languages are only included if their grammars are passed in. The category
+    column says which of the three lists a language came from (natural, optimal_artificial, first_gen_artificial).
+    all_language_constructions needs either a constructions or a (precomputed) tokens column.
+    numbers is the range the constructions were generated for. avg_ms_complexity uses DEFAULT_PRIOR. For every name in priors (keys of PRIORS), an additional
+    avg_ms_complexity_<prior> column is added, all computed from the same token counts.
+    language_token_counts is the result of token_count_matrix for all_language_constructions, if the caller
+    already built it.
+    """
+    grammars = []
+    if natural_language_grammars is not None:
+        grammars += natural_language_grammars
+    grammars += artificial_language_grammars
+    if first_gen_language_grammars is not None:
+        grammars += first_gen_language_grammars
+
+    # Category of every language (see analysis_data)
+    categories = ['natural'] * len(natural_language_grammars or []) + ['optimal_artificial'] * len(artificial_language_grammars)
+    categories += ['first_gen_artificial'] * len(first_gen_language_grammars or [])
+
+    # Gather the rows first and build the DataFrame once
+    rows = []
+    for grammar, category in zip(grammars, categories):
         # Lexicon
-        digits = set(eval(language['digits']))
-        bases = set(eval(language['bases']))
-        monomorphemics = set(eval(language['monomorphemics']))
-
-        # Grammar
-        curr_bases = eval(language['curr_bases'])
-        num_addition = eval(language['number_addition_max'])
-        num_subtraction = eval(language['number_subtraction_max'])
-        phrase_subtraction = eval(language['phrase_subtraction'])
-        exceptions = eval(language['exceptions'])
+        digits, bases, monomorphemics = grammar.lexicon()
 
         lexicon_size = calculate_lexicon(digits, bases, monomorphemics)
-        grammar_size = calculate_grammar(curr_bases, num_addition, num_subtraction, phrase_subtraction, exceptions)
-        language_analysis = pd.concat([language_analysis, pd.DataFrame([[name, 'artificial', lexicon_size, grammar_size, lexicon_size + grammar_size, 0]], 
-                                                columns=language_analysis.columns)], ignore_index=True)
-    
-    nrows = first_gen_language_grammars.shape[0]
-    for i in range(nrows):
-        language = first_gen_language_grammars.iloc[i]
-        
-        # Read each column
-        name = language['language']
-        
-        # Lexicon
-        digits = set(eval(language['digits']))
-        bases = set(eval(language['bases']))
-        monomorphemics = set(eval(language['monomorphemics']))
+        grammar_size = calculate_grammar(grammar.curr_bases, grammar.number_addition_max, grammar.number_subtraction_max,
+                                         grammar.phrase_subtraction, grammar.exceptions)
+        rows.append([grammar.language, grammar.type, lexicon_size, grammar_size, lexicon_size + grammar_size, 0, category])
+    language_analysis = pd.DataFrame(rows, columns=['language', 'type', 'lexicon', 'grammar', 'lexicon_grammar', 'avg_ms_complexity',
+                                                    'category'])
+
+    # Score every language under every prior at once and join the results back by language
+    all_priors = [DEFAULT_PRIOR] + [prior for prior in priors if prior != DEFAULT_PRIOR]
+    if language_token_counts is None:
+        language_token_counts = token_count_matrix(all_language_constructions, numbers)
+    languages, token_counts = language_token_counts
+    avg_ms_complexities = pd.DataFrame(token_counts @ prior_weight_matrix(all_priors, numbers),
+                                       index=languages, columns=all_priors)
+    names = language_analysis['language']
+
+    language_analysis['avg_ms_complexity'] = names.map(avg_ms_complexities[DEFAULT_PRIOR]).fillna(0)
+    for prior in priors:
+        language_analysis[f'avg_ms_complexity_{prior}'] = names.map(avg_ms_complexities[prior]).fillna(0)
+    return language_analysis
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Calculate lexicon size and avg_ms_complexity of every language.")
+    parser.add_argument('priors', nargs='*', metavar='prior',
+                        help=f"prior to add an avg_ms_complexity_<prior> column for ({', '.join(PRIORS)})")
+    priors = parser.parse_args(args).priors
+    # Checked here, as argparse rejects an empty list of a nargs='*' positional with choices
+    for prior in priors:
+        if prior not in PRIORS:
+            parser.error(f"unknown prior {prior}, expected one of {', '.join(PRIORS)}")
 
-        # Grammar
-        curr_bases = eval(language['curr_bases'])
-        num_addition = eval(language['number_addition_max'])
-        num_subtraction = eval(language['number_subtraction_max'])
-        phrase_subtraction = eval(language['phrase_subtraction'])
-        exceptions = eval(language['exceptions'])
+    # Read language-specifics from file
+    natural_language_grammars = read_grammars(NATURAL_GRAMMAR_PATH)
+    artificial_language_grammars = read_grammars(ARTIFICIAL_LANGUAGE_FILE)
+    first_gen_language_grammars = read_grammars(FIRST_GEN_ART_LANG_FILE)
+    all_language_constructions = read_language_constructions()
 
-        lexicon_size = calculate_lexicon(digits, bases, monomorphemics)
-        grammar_size = calculate_grammar(curr_bases, num_addition, num_subtraction, phrase_subtraction, exceptions)
-        language_analysis = pd.concat([language_analysis, pd.DataFrame([[name, 'artificial', lexicon_size, grammar_size, lexicon_size + grammar_size, 0]], 
-                                                columns=language_analysis.columns)], ignore_index=True)
-    
-    for language, group in all_language_constructions.groupby('language'):
-    # Split the group into chunks of 99 rows
-        for i in range(0, len(group), 99):
-            chunk = group.iloc[i:i + 99]
-            avg_ms_complexity = calculate_avg_ms_complexity(chunk['constructions'])
-            language_analysis.loc[language_analysis['language'] == language, 'avg_ms_complexity'] = avg_ms_complexity
-    
+    language_analysis = analyse_languages(all_language_constructions, artificial_language_grammars,
+                                          natural_language_grammars, first_gen_language_grammars, priors)
     language_analysis.to_csv(COMPLEXITY_OUTPUT_FILE, index=False)
 
 if __name__ == "__main__":
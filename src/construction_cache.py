@@ -0,0 +1,97 @@
+from array import array
+import hashlib
+import json
+import sqlite3
+import time
+
+OUTPUT_DIR = "data"
+CACHE_FILE = f"{OUTPUT_DIR}/construction_cache.sqlite"
+
+# Max number of grammars kept in the cache. The least recently used ones are evicted first.
+MAX_ENTRIES = 200000
+
+# Version of the construction engine (hurford_grammar.generate_numbers) and of the table layout. Increase it
+# whenever a change can alter the constructions of a grammar. A cache file written with another version is
+# emptied when opened.
+CACHE_VERSION = 2
+
+def grammar_key(grammar, target_range):
+    """
+    Returns a canonical hash of everything that determines a grammar's constructions: the lexicon
+    (as sets), the rules, the exceptions and the target range. The language name is not part of it,
+    so identical grammars share an entry.
+    """
+    canonical = [
+        sorted(set(grammar.digits)),
+        sorted(set(grammar.bases)),
+        sorted(set(grammar.monomorphemics)),
+        grammar.curr_bases,
+        grammar.number_addition_max,
+        grammar.number_subtraction_max,
+        grammar.exceptions,
+        [target_range.start, target_range.stop],
+    ]
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode()).hexdigest()
+
+class ConstructionCache:
+    """
+    Persistent, content-addressed cache of generated constructions, stored in a sqlite file.
+    Maps grammar_key() to the list of constructions for the target range and their token counts. The entries are only valid for
+    the version of the construction engine they were written with (see CACHE_VERSION).
+    """
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES, version=CACHE_VERSION):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != str(version):
+            # Constructions of another engine version (or of a file from before versioning) are stale
+            self.connection.execute("DROP TABLE IF EXISTS constructions")
+            self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (str(version),))
+        self.connection.execute("CREATE TABLE IF NOT EXISTS constructions "
+                                "(key TEXT PRIMARY KEY, forms TEXT NOT NULL, tokens BLOB NOT NULL, last_used INTEGER NOT NULL)")
+        self.connection.commit()
+
+    def get_many(self, keys):
+        """Returns a dict from the keys found in the cache to their (constructions, token counts)."""
+        found = {}
+        keys = list(set(keys))
+        # Stay below sqlite's limit on the number of query parameters
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(f"SELECT key, forms, tokens FROM constructions WHERE key IN ({placeholders})",
+                                           batch)
+            for key, forms, tokens in rows:
+                token_counts = array('i')
+                token_counts.frombytes(tokens)
+                found[key] = (forms.split("\n"), token_counts)
+        if found:
+            now = time.time_ns()
+            self.connection.executemany("UPDATE constructions SET last_used = ? WHERE key = ?",
+                                        [(now, key) for key in found])
+            self.connection.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (key, constructions, token counts) triples and evicts the least recently used entries above
+        max_entries.
+        """
+        now = time.time_ns()
+        self.connection.executemany("INSERT OR REPLACE INTO constructions (key, forms, tokens, last_used) "
+                                    "VALUES (?, ?, ?, ?)",
+                                    [(key, "\n".join(forms), array('i', tokens).tobytes(), now)
+                                     for key, forms, tokens in items])
+        self.connection.execute("DELETE FROM constructions WHERE key IN "
+                                "(SELECT key FROM constructions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                                (self.max_entries,))
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM constructions").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
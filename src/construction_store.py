@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# Arrays stored in a construction .npz file:
+#   languages      unique language names (dictionary for language_ids)
+#   language_ids   index into languages for every row
+#   numbers        number constructed in every row
+#   tokens         token count of the construction (what avg_ms_complexity uses)
+#   constructions  construction strings
+# np.load only decompresses the arrays that are accessed, so readers that only need
+# token counts never parse the construction strings.
+
+def count_tokens(construction):
+    """Returns the number of tokens in a construction (e.g. '(2 * 10)' has 3)."""
+    return len(str(construction).split())
+
+def write_constructions_npz(language_constructions, path):
+    """
+    Writes a language constructions DataFrame (language, number, constructions and optionally
+    tokens) to a compressed columnar .npz file with dictionary-encoded language names.
+    """
+    language_ids, languages = pd.factorize(language_constructions['language'])
+    constructions = language_constructions['constructions'].astype(str).to_numpy(dtype=str)
+    if 'tokens' in language_constructions:
+        tokens = language_constructions['tokens'].to_numpy(dtype=np.int32)
+    else:
+        tokens = np.array([count_tokens(construction) for construction in constructions], dtype=np.int32)
+    np.savez_compressed(path,
+                        languages=np.asarray(languages, dtype=str),
+                        language_ids=language_ids.astype(np.int32),
+                        numbers=language_constructions['number'].to_numpy(dtype=np.int32),
+                        tokens=tokens,
+                        constructions=constructions)
+
+def read_constructions_npz(path, columns=('language', 'number', 'tokens'), languages=None):
+    """
+    Reads the given columns ('language', 'number', 'tokens', 'constructions') of a construction
+    .npz file. If languages is given, only rows for those languages are returned.
+    """
+    with np.load(path, allow_pickle=False) as store:
+        names = store['languages']
+        language_ids = store['language_ids']
+
+        rows = slice(None)
+        if languages is not None:
+            wanted = np.flatnonzero(np.isin(names, list(languages)))
+            rows = np.isin(language_ids, wanted)
+
+        data = {}
+        for column in columns:
+            if column == 'language':
+                data['language'] = names[language_ids[rows]]
+            elif column == 'number':
+                data['number'] = store['numbers'][rows]
+            elif column == 'tokens':
+                data['tokens'] = store['tokens'][rows]
+            elif column == 'constructions':
+                data['constructions'] = store['constructions'][rows]
+            else:
+                raise ValueError(f"Unknown construction column: {column}")
+    return pd.DataFrame(data)
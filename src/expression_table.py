@@ -0,0 +1,92 @@
+import re
+
+# Tokens of a construction string: parentheses and everything between spaces and parentheses
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+
+class ExpressionTable:
+    """
+    Hash-consed table of constructions. Every construction is a node id: either a leaf (a number or
+    an exception string that is not a construction itself) or an (op, left id, right id) node.
+    Identical constructions always get the same id, so sets of ids behave like sets of construction
+    strings, and building a construction costs the same no matter how long it is.
+    The token count of every node (what avg_ms_complexity uses) is cached in tokens. Strings are
+    only rendered for output.
+    """
+    def __init__(self):
+        # nodes[id] = (op, left, right). Leaves are (None, text, None).
+        self.nodes = []
+        self.tokens = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def leaf(self, text, tokens=None):
+        """
+        Returns the id of a leaf construction (e.g. '5'). tokens is its token count if it is already
+        known, e.g. for a construction string read from the construction cache.
+        """
+        key = (None, text, None)
+        node_id = self.ids.get(key)
+        if node_id is None:
+            node_id = self.ids[key] = len(self.nodes)
+            self.nodes.append(key)
+            self.tokens.append(len(text.split()) if tokens is None else tokens)
+        return node_id
+
+    def node(self, op, left, right):
+        """Returns the id of the construction (left op right)."""
+        key = (op, left, right)
+        node_id = self.ids.get(key)
+        if node_id is None:
+            node_id = self.ids[key] = len(self.nodes)
+            self.nodes.append(key)
+            self.tokens.append(self.tokens[left] + self.tokens[right] + 1)
+        return node_id
+
+    def parse(self, text):
+        """
+        Returns the id of a construction string, e.g. an exception. Strings in the format that
+        render() produces are parsed into nodes, so that they share ids with the same constructions
+        built from the grammar. Anything else becomes a leaf.
+        """
+        tokens = TOKEN_PATTERN.findall(text)
+        position = [0]
+
+        def parse_expression():
+            token = tokens[position[0]]
+            position[0] += 1
+            if token != "(":
+                return self.leaf(token)
+            left = parse_expression()
+            op = tokens[position[0]]
+            position[0] += 1
+            right = parse_expression()
+            if tokens[position[0]] != ")":
+                raise ValueError(text)
+            position[0] += 1
+            return self.node(op, left, right)
+
+        try:
+            node_id = parse_expression()
+            if position[0] == len(tokens) and self.render(node_id) == text:
+                return node_id
+        except (IndexError, ValueError):
+            pass
+        return self.leaf(text)
+
+    def render(self, node_id, rendered=None):
+        """
+        Returns the construction string of a node, e.g. '((2 * 10) + 1)'. rendered is an optional dict
+        of already rendered nodes that is shared between calls.
+        """
+        if rendered is not None and node_id in rendered:
+            return rendered[node_id]
+        op, left, right = self.nodes[node_id]
+        if op is None:
+            text = left
+        else:
+            text = "(" + self.render(left, rendered) + " " + op + " " + self.render(right, rendered) + ")"
+        if rendered is not None:
+            rendered[node_id] = text
+        return text
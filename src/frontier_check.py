@@ -0,0 +1,167 @@
+import contextlib
+import itertools
+import os
+import random
+import sys
+import time
+
+import artificial_language_generation
+import hurford_grammar
+from artificial_language_generation import MAX_DIGITS, MAX_MONOMORPHEMICS, MAX_NUM_BASES
+from complexity_analysis import DEFAULT_PRIOR, PRIORS, prior_weights
+from expression_table import ExpressionTable
+from frontier_search import (BOUND_TOLERANCE, SearchTables, lexicon_bound, make_grammar, number_costs,
+                             search_frontier, structure_costs)
+from grammar import NUMBERS, UPPER_BOUND
+
+# Checks of the exact frontier search (frontier_search.py). Re-run them after changing the language
+# generator, the construction engine or the lower bounds:
+#   brute force: every language of the lexicon sizes up to BRUTE_FORCE_MAX_LEXICON is constructed, and the
+#                best complexity of each size has to equal the one search_frontier finds from scratch
+#   bounds:      for BOUND_CHECK_GRAMMARS random languages of generate_language, the token count of every
+#                number and the complexity have to be at least the lower bounds the search prunes with
+
+BRUTE_FORCE_MIN_LEXICON = 2
+BRUTE_FORCE_MAX_LEXICON = 4
+
+BOUND_CHECK_GRAMMARS = 3000
+BOUND_CHECK_SEED = 0
+
+def search_space(lexicon_size):
+    """Yields every grammar with lexicon_size words in the search space of frontier_search."""
+    for digits in range(1, min(MAX_DIGITS, lexicon_size - 1) + 1):
+        first_base = digits + 1
+        num_words = lexicon_size - first_base
+        for words in itertools.combinations(range(first_base + 1, UPPER_BOUND), num_words):
+            for num_bases in range(max(0, num_words - MAX_MONOMORPHEMICS), min(MAX_NUM_BASES - 1, num_words) + 1):
+                for other_bases in itertools.combinations(words, num_bases):
+                    bases = [first_base] + list(other_bases)
+                    monomorphemics = [word for word in words if word not in other_bases]
+                    # Subtraction needs 2 * first base as the second base
+                    max_subs = [None]
+                    if len(bases) > 1 and bases[1] == 2 * first_base:
+                        max_subs += list(range(2, digits + 2))
+                    for max_sub in max_subs:
+                        for num_exceptions in range(len(bases) + 1):
+                            yield make_grammar(f"brute_force_l{lexicon_size}", digits, bases, monomorphemics,
+                                               max_sub, num_exceptions)
+
+def token_counts(grammar, numbers=NUMBERS):
+    """Returns the token count of every number (indexed by number), or None if a number has no construction."""
+    digits, bases, monomorphemics = grammar.lexicon()
+    expressions = ExpressionTable()
+    # generate_numbers prints ambiguous constructions (see grammar_complexity)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        final_results = hurford_grammar.generate_numbers(numbers, digits, bases, monomorphemics, grammar.curr_bases,
+                                                         grammar.number_addition_max, grammar.number_subtraction_max,
+                                                         grammar.phrase_subtraction, grammar.exceptions,
+                                                         expressions=expressions)
+    if any(final_results[number] is None for number in numbers):
+        return None
+    return [expressions.tokens[node_id] if node_id is not None else 0 for node_id in final_results]
+
+def brute_force_frontier(lexicon_sizes, weights):
+    """Returns the lowest avg_ms_complexity of every lexicon size by constructing every language, and the count."""
+    best = {}
+    num_grammars = 0
+    for lexicon_size in lexicon_sizes:
+        for grammar in search_space(lexicon_size):
+            num_grammars += 1
+            tokens = token_counts(grammar)
+            if tokens is None:
+                continue
+            complexity = sum(weight * tokens[number] for number, weight in zip(NUMBERS, weights))
+            best[lexicon_size] = min(best.get(lexicon_size, float('inf')), complexity)
+    return best, num_grammars
+
+def check_brute_force(min_lexicon=BRUTE_FORCE_MIN_LEXICON, max_lexicon=BRUTE_FORCE_MAX_LEXICON,
+                      prior=DEFAULT_PRIOR):
+    """Compares search_frontier (without incumbents) with brute_force_frontier. Returns the mismatches."""
+    weights = list(prior_weights(PRIORS[prior]))
+    lexicon_sizes = range(min_lexicon, max_lexicon + 1)
+    expected, num_grammars = brute_force_frontier(lexicon_sizes, weights)
+    frontier = search_frontier(lexicon_sizes, num_workers=1, prior=prior)
+    found = dict(zip(frontier['lexicon'], frontier['avg_ms_complexity']))
+
+    mismatches = []
+    for lexicon_size in lexicon_sizes:
+        if abs(found.get(lexicon_size, float('inf')) - expected.get(lexicon_size, float('inf'))) > BOUND_TOLERANCE:
+            mismatches.append((lexicon_size, expected.get(lexicon_size), found.get(lexicon_size)))
+        print(f"lexicon {lexicon_size}: brute force {expected.get(lexicon_size)}, search {found.get(lexicon_size)}")
+    print(f"{num_grammars} languages constructed")
+    return mismatches
+
+def bound_violations(grammar, tables):
+    """
+    Returns the lower bounds of frontier_search that the grammar violates (empty if it has ERR constructions):
+    number_costs and structure_costs per number, the bound with exceptions, and lexicon_bound at every node
+    of the search path that leads to the grammar's lexicon.
+    """
+    tokens = token_counts(grammar)
+    if tokens is None:
+        return []
+    digits, bases, monomorphemics = grammar.lexicon()
+    num_digits = len(digits)
+    lexical = 0
+    for word in digits | bases | monomorphemics:
+        lexical |= 1 << word
+    weights = tables.weights
+    complexity = sum(weights[number] * tokens[number] for number in NUMBERS)
+
+    violations = []
+    lexical_costs = number_costs(lexical, num_digits, UPPER_BOUND - 1)
+    costs = structure_costs(lexical, num_digits, sorted(bases), bool(grammar.number_subtraction_max), lexical_costs)
+    for number in NUMBERS:
+        if lexical_costs[number] > tokens[number]:
+            violations.append(('number_costs', number, lexical_costs[number], tokens[number]))
+        elif costs[number] > tokens[number]:
+            violations.append(('structure_costs', number, costs[number], tokens[number]))
+
+    # Each exception constructs a base with 3 tokens instead of 1
+    bound = sum(weight * cost for weight, cost in zip(weights, costs))
+    bound += 2 * sum(weights[exception[0]] for exception in grammar.exceptions)
+    if bound > complexity + BOUND_TOLERANCE:
+        violations.append(('exceptions', None, float(bound), float(complexity)))
+
+    # The search chooses the words above the first base in increasing order
+    first_base = num_digits + 1
+    words = sorted(word for word in bases | monomorphemics if word > first_base)
+    for i, last in enumerate([first_base] + words):
+        prefix = lexical & ((1 << (last + 1)) - 1)
+        bound = lexicon_bound(tables, prefix, num_digits, last, len(words) - i)
+        if bound > complexity + BOUND_TOLERANCE:
+            violations.append(('lexicon_bound', last, float(bound), float(complexity)))
+    return violations
+
+def check_bounds(num_grammars=BOUND_CHECK_GRAMMARS, seed=BOUND_CHECK_SEED, prior=DEFAULT_PRIOR):
+    """Checks the lower bounds on random languages of generate_language. Returns the violations by language."""
+    tables = SearchTables(list(prior_weights(PRIORS[prior])))
+    random.seed(seed)
+    violations = {}
+    for i in range(num_grammars):
+        grammar = artificial_language_generation.generate_language(i, 0)
+        grammar_violations = bound_violations(grammar, tables)
+        if grammar_violations:
+            violations[grammar.language] = grammar_violations
+    print(f"{num_grammars} random languages checked, {len(violations)} with bound violations")
+    return violations
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    # Optional command-line arguments: largest brute-forced lexicon size and number of random languages
+    max_lexicon = int(args[0]) if len(args) > 0 else BRUTE_FORCE_MAX_LEXICON
+    num_grammars = int(args[1]) if len(args) > 1 else BOUND_CHECK_GRAMMARS
+
+    start = time.perf_counter()
+    mismatches = check_brute_force(max_lexicon=max_lexicon)
+    violations = check_bounds(num_grammars)
+    for mismatch in mismatches:
+        print("Search differs from brute force (lexicon, brute force, search):", mismatch)
+    for language, language_violations in violations.items():
+        print(language, language_violations)
+    print(f"Finished in {time.perf_counter() - start:.1f} s")
+    if mismatches or violations:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
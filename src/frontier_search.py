@@ -0,0 +1,336 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import copy
+import itertools
+import os
+import time
+import pandas as pd
+
+import hurford_grammar
+from artificial_language_generation import (ARTIFICIAL_LANGUAGE_FILE, FIRST_GEN_ART_LANG_FILE, MAX_DIGITS,
+                                            MAX_MONOMORPHEMICS, MAX_NUM_BASES, add_sub_rule, base_exceptions,
+                                            generate_multiplication_rule)
+from complexity_analysis import DEFAULT_PRIOR, PRIORS, prior_weights
+from expression_table import ExpressionTable
+from grammar import NUMBERS, UPPER_BOUND, Grammar, read_grammars, write_grammars
+
+OUTPUT_DIR = "data"
+FRONTIER_OUTPUT_FILE = f"{OUTPUT_DIR}/exact_frontier.csv"
+FRONTIER_GRAMMAR_FILE = f"{OUTPUT_DIR}/exact_frontier_grammars.csv"
+
+# Lexicon sizes searched by default. The search space grows quickly with the lexicon size.
+MIN_LEXICON = 2
+MAX_LEXICON = 8
+
+NUM_WORKERS = os.cpu_count() or 1
+
+# Subtrees are pruned if their lower bound is not below the best complexity minus BOUND_TOLERANCE,
+# so languages that are better by less than this (rounding) are not searched for
+BOUND_TOLERANCE = 1e-9
+
+# Bit mask of the numbers that can be lexicalized (1 to UPPER_BOUND - 1)
+ALL_NUMBERS = (1 << UPPER_BOUND) - 2
+
+# The search covers the grammars that artificial_language_generation.generate_language can produce:
+# digits 1..d (d <= MAX_DIGITS), a first base d + 1 plus up to MAX_NUM_BASES - 1 other bases, up to
+# MAX_MONOMORPHEMICS monomorphemics, optionally subtraction (second base 2 * (d + 1), any max subtrahand)
+# and optionally exceptions for the first bases. A language is only a candidate if every number has a
+# construction (no ERR).
+#
+# The lower bounds use the token counts that are possible for a number:
+#   1  lexicalized numbers (digits, bases, monomorphemics)
+#   3  (a op b) of two lexicalized numbers, or an exception
+#   5  (a op b) where one of a, b has 3 tokens
+#   7  anything else
+# Sums and products are the only operations outside of subtraction, which only constructs numbers
+# in [2 * b0 - d, 2 * b0) as 2 * b0 minus a digit (b0 is the first base).
+
+def bit_numbers(mask):
+    """Yields the numbers in a bit mask."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def sums(first, second):
+    """Returns the bit mask of all sums of a number in first and a number in second."""
+    result = 0
+    for number in bit_numbers(first):
+        result |= second << number
+    return result & ALL_NUMBERS
+
+def products(first, second):
+    """Returns the bit mask of all products of a number > 1 in first and a number > 1 in second."""
+    result = 0
+    second_numbers = [number for number in bit_numbers(second) if number > 1]
+    for number in bit_numbers(first):
+        if number < 2:
+            continue
+        for other in second_numbers:
+            if number * other >= UPPER_BOUND:
+                break
+            result |= 1 << (number * other)
+    return result
+
+def subtraction_mask(digits):
+    """Returns the bit mask of the numbers that subtraction can construct with the given number of digits."""
+    first_base = digits + 1
+    return sum(1 << number for number in range(max(first_base + 1, 2 * first_base - digits), 2 * first_base))
+
+def token_bounds(lexical, digits):
+    """
+    Returns the bit masks of the numbers that can have constructions of at most 3 and at most 5 tokens,
+    if the numbers in the bit mask lexical are lexicalized.
+    """
+    three = sums(lexical, lexical) | products(lexical, lexical) | subtraction_mask(digits)
+    operands = three | lexical
+    five = three | sums(operands, lexical) | products(operands, lexical)
+    return three, five
+
+class SearchTables:
+    """Prior weights of the numbers and the suffix sums the bounds need."""
+    def __init__(self, weights):
+        self.weights = [0.0] * UPPER_BOUND
+        for number, weight in zip(NUMBERS, weights):
+            self.weights[number] = weight
+        # suffix[n] = total weight of the numbers >= n
+        self.suffix = [0.0] * (UPPER_BOUND + 1)
+        for number in range(UPPER_BOUND - 1, 0, -1):
+            self.suffix[number] = self.suffix[number + 1] + self.weights[number]
+        # top[n][k] = total weight of the k heaviest numbers > n
+        self.top = []
+        for number in range(UPPER_BOUND):
+            heaviest = sorted(self.weights[number + 1:], reverse=True)
+            self.top.append(list(itertools.accumulate(heaviest, initial=0.0)))
+
+def number_costs(lexical, digits, last):
+    """
+    Lower bounds on the token count of the numbers 1..last, given that the numbers in the bit mask
+    lexical are exactly the lexicalized numbers up to last.
+    """
+    three, five = token_bounds(lexical, digits)
+    costs = [0] * (last + 1)
+    for number in range(1, last + 1):
+        bit = 1 << number
+        costs[number] = 1 if lexical & bit else 3 if three & bit else 5 if five & bit else 7
+    return costs
+
+def lexicon_bound(tables, lexical, digits, last, remaining):
+    """
+    Lower bound on avg_ms_complexity of any language whose lexicalized numbers up to last are the numbers in the
+    bit mask lexical and that lexicalizes remaining more numbers above last.
+    The numbers up to last cost as in number_costs. Every construction of a number up to last only uses
+    smaller numbers, except subtraction, which subtraction_mask already allows. The numbers above last
+    cost at least 3, or 1 for the remaining heaviest ones.
+    """
+    costs = number_costs(lexical, digits, last)
+    weights = tables.weights
+    bound = sum(weights[number] * costs[number] for number in range(1, last + 1))
+    return bound + 3 * tables.suffix[last + 1] - 2 * tables.top[last][remaining]
+
+def structure_costs(lexical, digits, bases, subtraction, lexical_costs):
+    """
+    Tightens lexical_costs for a language with the given (sorted) bases. A number that is not lexicalized
+    can only have 3 tokens as (quotient * current base), (phrase + addend) with a phrase that is a multiple of
+    the current base and an addend below the current base, or (2 * first base - digit) with subtraction.
+    """
+    costs = list(lexical_costs)
+    first_base = bases[0]
+    base_index = 0
+    for number in range(first_base + 1, UPPER_BOUND):
+        if lexical >> number & 1 or costs[number] > 3:
+            continue
+        while base_index + 1 < len(bases) and bases[base_index + 1] <= number:
+            base_index += 1
+        current_base = bases[base_index]
+        quotient, remainder = divmod(number, current_base)
+        if remainder == 0 and quotient > 1 and lexical >> quotient & 1:
+            continue
+        if subtraction and 2 * first_base - digits <= number < 2 * first_base:
+            continue
+        if any(lexical >> phrase & 1 and lexical >> (number - phrase) & 1
+               for phrase in range(quotient * current_base, number - current_base, -current_base) if phrase > 0):
+            continue
+        costs[number] = 5
+    return costs
+
+def make_grammar(name, digits, bases, monomorphemics, max_sub=None, num_exceptions=0):
+    """Builds the grammar of a language in the search space, like generate_language does."""
+    digit_list = list(range(1, digits + 1))
+    multiplication_rule = generate_multiplication_rule(bases)
+    addition_rule = copy.deepcopy(multiplication_rule)
+    subtraction_rule = []
+    if max_sub is not None:
+        addition_rule, subtraction_rule = add_sub_rule(bases, addition_rule, max_sub)
+    return Grammar(name, digit_list, list(bases), list(monomorphemics), multiplication_rule, addition_rule,
+                   subtraction_rule, [], base_exceptions(bases, num_exceptions))
+
+def grammar_complexity(grammar, weights, numbers=NUMBERS, expressions=None):
+    """
+    Returns avg_ms_complexity of a grammar, or None if any number has no construction (ERR). The constructions
+    are built in expressions, the node table of the calling task (a new one if it is None), not in
+    hurford_grammar.EXPRESSIONS, which would keep every construction of the search.
+    """
+    if expressions is None:
+        expressions = ExpressionTable()
+    digits, bases, monomorphemics = grammar.lexicon()
+    # generate_numbers prints ambiguous constructions, which are ERR and are not candidates anyway
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        final_results = hurford_grammar.generate_numbers(numbers, digits, bases, monomorphemics, grammar.curr_bases,
+                                                         grammar.number_addition_max, grammar.number_subtraction_max,
+                                                         grammar.phrase_subtraction, grammar.exceptions,
+                                                         expressions=expressions)
+    tokens = expressions.tokens
+    total = 0.0
+    for number, weight in zip(numbers, weights):
+        node_id = final_results[number]
+        if node_id is None:
+            return None
+        total += weight * tokens[node_id]
+    return total
+
+def search_digits(lexicon_size, digits, incumbent, weights):
+    """
+    Branch-and-bound search over the languages with lexicon_size words and the given number of digits.
+    The lexicalized numbers above the first base are chosen in increasing order (depth-first) and subtrees
+    whose lexicon_bound is not below the best complexity so far (starting at incumbent) are pruned. For every
+    complete lexicon, each split into bases and monomorphemics, with and without subtraction and exceptions,
+    is bounded with structure_costs and only constructed if it can beat the best complexity.
+    Returns the best complexity and grammar found (None if nothing beats incumbent) and search statistics.
+    """
+    tables = SearchTables(weights)
+    # One node table per task, freed when it returns
+    expressions = ExpressionTable()
+    first_base = digits + 1
+    num_words = lexicon_size - first_base
+    best = [incumbent, None]
+    stats = {'nodes': 0, 'lexicons': 0, 'structures': 0, 'constructed': 0}
+
+    def evaluate(lexical, words):
+        stats['lexicons'] += 1
+        lexical_costs = number_costs(lexical, digits, UPPER_BOUND - 1)
+        for num_bases in range(max(0, len(words) - MAX_MONOMORPHEMICS), min(MAX_NUM_BASES - 1, len(words)) + 1):
+            for other_bases in itertools.combinations(words, num_bases):
+                bases = [first_base] + list(other_bases)
+                monomorphemics = [word for word in words if word not in other_bases]
+                # Subtraction needs 2 * first base as the second base
+                can_subtract = len(bases) > 1 and bases[1] == 2 * first_base
+                for subtraction in (False, True) if can_subtract else (False,):
+                    stats['structures'] += 1
+                    costs = structure_costs(lexical, digits, bases, subtraction, lexical_costs)
+                    bound = sum(weight * cost for weight, cost in zip(tables.weights, costs))
+                    # Each exception constructs a base with 3 tokens instead of 1
+                    for num_exceptions in range(len(bases) + 1):
+                        if num_exceptions:
+                            bound += 2 * tables.weights[bases[num_exceptions - 1]]
+                        if bound >= best[0] - BOUND_TOLERANCE:
+                            break
+                        for max_sub in range(2, digits + 2) if subtraction else (None,):
+                            name = f"exact_language_l{lexicon_size}_d{digits}_{stats['constructed']}"
+                            grammar = make_grammar(name, digits, bases, monomorphemics, max_sub, num_exceptions)
+                            stats['constructed'] += 1
+                            complexity = grammar_complexity(grammar, weights, expressions=expressions)
+                            if complexity is not None and complexity < best[0]:
+                                best[0], best[1] = complexity, grammar
+
+    def search(lexical, words, last):
+        stats['nodes'] += 1
+        remaining = num_words - len(words)
+        if lexicon_bound(tables, lexical, digits, last, remaining) >= best[0] - BOUND_TOLERANCE:
+            return
+        if not remaining:
+            evaluate(lexical, words)
+            return
+        for word in range(last + 1, UPPER_BOUND - remaining + 1):
+            search(lexical | 1 << word, words + [word], word)
+
+    start = time.perf_counter()
+    search((1 << (first_base + 1)) - 2, [], first_base)
+    stats['seconds'] = time.perf_counter() - start
+    return best[0] if best[1] is not None else None, best[1], stats
+
+def search_task(task):
+    """Worker for search_frontier: runs search_digits for one (lexicon size, digits, incumbent, weights) task."""
+    return search_digits(*task)
+
+def incumbents(grammars, weights):
+    """
+    Returns the best complexity and language of every lexicon size among grammars (e.g. the artificial
+    languages of the analysis), counting only languages without ERR constructions.
+    """
+    best = {}
+    expressions = ExpressionTable()
+    for grammar in grammars:
+        complexity = grammar_complexity(grammar, weights, expressions=expressions)
+        if complexity is None:
+            continue
+        lexicon_size = sum(len(words) for words in grammar.lexicon())
+        if lexicon_size not in best or complexity < best[lexicon_size][0]:
+            best[lexicon_size] = (complexity, grammar.language)
+    return best
+
+def search_frontier(lexicon_sizes, start_grammars=(), num_workers=NUM_WORKERS, prior=DEFAULT_PRIOR):
+    """
+    Finds the languages with the lowest avg_ms_complexity of each lexicon size in the search space.
+    start_grammars seed the incumbent of every lexicon size, so only better languages are searched for.
+    Each (lexicon size, number of digits) is searched as a separate task in num_workers processes.
+    Returns one row per lexicon size with the optimal complexity and language ('source' is 'search' if it
+    was found by the search, or 'incumbent' if no language in the search space beats the incumbent).
+    """
+    weights = list(prior_weights(PRIORS[prior]))
+    seeds = incumbents(start_grammars, weights)
+    tasks = []
+    for lexicon_size in lexicon_sizes:
+        incumbent = seeds.get(lexicon_size, (float('inf'), None))[0]
+        for digits in range(max(1, lexicon_size - MAX_NUM_BASES - MAX_MONOMORPHEMICS), min(MAX_DIGITS, lexicon_size - 1) + 1):
+            tasks.append((lexicon_size, digits, incumbent, weights))
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(search_task, tasks))
+    else:
+        results = [search_task(task) for task in tasks]
+
+    rows = {}
+    for (lexicon_size, digits, incumbent, _), (complexity, grammar, stats) in zip(tasks, results):
+        incumbent_language = seeds.get(lexicon_size, (None, None))[1]
+        row = rows.setdefault(lexicon_size, {'lexicon': lexicon_size, 'avg_ms_complexity': incumbent,
+                                             'language': incumbent_language, 'source': 'incumbent', 'grammar': None,
+                                             'incumbent_complexity': incumbent, 'incumbent_language': incumbent_language,
+                                             'nodes': 0, 'lexicons': 0, 'structures': 0, 'constructed': 0, 'seconds': 0.0})
+        if grammar is not None and complexity < row['avg_ms_complexity']:
+            row.update({'avg_ms_complexity': complexity, 'language': grammar.language, 'source': 'search',
+                        'grammar': grammar})
+        for key, value in stats.items():
+            row[key] += value
+
+    frontier = pd.DataFrame([rows[lexicon_size] for lexicon_size in lexicon_sizes if lexicon_size in rows])
+    frontier['gap'] = frontier['incumbent_complexity'] - frontier['avg_ms_complexity']
+    return frontier
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Find the exact frontier by branch-and-bound search.")
+    parser.add_argument('min_lexicon', nargs='?', type=int, default=MIN_LEXICON,
+                        help=f"smallest lexicon size (default {MIN_LEXICON})")
+    parser.add_argument('max_lexicon', nargs='?', type=int, default=MAX_LEXICON,
+                        help=f"largest lexicon size (default {MAX_LEXICON})")
+    parser.add_argument('num_workers', nargs='?', type=int, default=NUM_WORKERS,
+                        help=f"number of worker processes (default {NUM_WORKERS})")
+    args = parser.parse_args(args)
+    min_lexicon, max_lexicon, num_workers = args.min_lexicon, args.max_lexicon, args.num_workers
+
+    # Seed the search with the artificial languages of the analysis
+    start_grammars = []
+    for path in (ARTIFICIAL_LANGUAGE_FILE, FIRST_GEN_ART_LANG_FILE):
+        if os.path.exists(path):
+            start_grammars += read_grammars(path)
+
+    frontier = search_frontier(range(min_lexicon, max_lexicon + 1), start_grammars, num_workers)
+    grammars = [grammar for grammar in frontier.pop('grammar') if grammar is not None]
+    print(frontier.to_string(index=False))
+    frontier.to_csv(FRONTIER_OUTPUT_FILE, index=False)
+    write_grammars(grammars, FRONTIER_GRAMMAR_FILE)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-import matplotlib.pyplot as plt
-from matplotlib import cm
 import pandas as pd
 
+from analysis_data import read_analysis, split_languages
+
 ANALYSIS_PATH = "data/language_analysis.csv"
 
 # Function to calculate Pareto frontier
@@ -29,17 +29,10 @@ def calculate_pareto_frontier(df, x_col, y_col):
     # Return Pareto frontier points as a NumPy array
     return pareto_frontier_df[[x_col, y_col]].values
 
-def main():
-    df = pd.read_csv(ANALYSIS_PATH)
-    
-    # Determine categories based on file structure
-    natural_languages = df[df['type'] != 'artificial']
-    optimal_start_idx = df[df['type'] == 'artificial'].index[0]
-    first_gen_indices = df[df['language'] == 'artificial_language_g0_0'].index
-    first_gen_start_idx = first_gen_indices[1] if len(first_gen_indices) > 1 else first_gen_indices[0]
-
-    optimal_art_langs = df.iloc[optimal_start_idx:first_gen_start_idx]
-    first_gen_art_langs = df.iloc[first_gen_start_idx:]
+def plot_languages(df):
+    """Scatter plot of natural, first generation and optimal artificial languages with the Pareto frontier (Figure 1 in paper)."""
+    import matplotlib.pyplot as plt
+    natural_languages, optimal_art_langs, first_gen_art_langs = split_languages(df)
 
     # NOTE: Didn't use mapped_color figure in final paper.
     # categories = natural_languages['type'].unique()
@@ -52,7 +45,7 @@ def main():
     # mapped_colors = natural_languages['type'].map(color_mapping)
     fig, axes = plt.subplots(1, 1, figsize=(6, 4))
 
-    
+    # Scatter layers are rasterized (axes, text and the frontier stay vectors in vector formats)
     # First plot with specific axes for natural languages
     axes.scatter(
         natural_languages['lexicon'], 
@@ -62,6 +55,7 @@ def main():
         label='Natural Languages', 
         zorder=2,
         alpha=1,
+        rasterized=True,
     )
     axes.scatter(
         first_gen_art_langs['lexicon'], 
@@ -72,6 +66,7 @@ def main():
         label='First Gen. Artificial Languages', 
         zorder=1,
         alpha=1,
+        rasterized=True,
     )
     axes.scatter(
         optimal_art_langs['lexicon'], 
@@ -80,6 +75,7 @@ def main():
         label='Optimal Artificial Languages', 
         zorder=1,
         alpha=1,
+        rasterized=True,
     )
 
     # Calculate and plot Pareto frontier for first plot
@@ -94,11 +90,17 @@ def main():
     axes.set_xlabel('Lexicon size')
     axes.set_ylabel('Average morphosyntactic complexity')
     axes.legend()
-    
+    return fig
+
+def main():
+    import matplotlib.pyplot as plt
+    df = read_analysis(ANALYSIS_PATH)
+    fig = plot_languages(df)
+
     fig.savefig('images/test.png', dpi=1000)
     plt.tight_layout()
     plt.subplots_adjust(top=0.9)  # Adjust top to fit the title
     plt.show()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
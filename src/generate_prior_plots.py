@@ -1,7 +1,14 @@
-import matplotlib.pyplot as plt
-from matplotlib import cm
 import pandas as pd
 
+from analysis_data import read_analysis
+
+# Complexity files of the priors and their plot titles
+PRIOR_PLOT_FILES = [
+    ("data/pl_complexity.csv", "PL Complexity"),
+    ("data/rev_complexity.csv", "Reversed PL Complexity"),
+    ("data/uni_complexity.csv", "Uniform Complexity")
+]
+
 def calculate_pareto_frontier(df, x_col, y_col):
     df_sorted = df.sort_values(by=x_col).dropna(subset=[x_col, y_col])
     pareto_frontier = [df_sorted.iloc[0]]  # Start with the first row
@@ -18,7 +25,12 @@ def calculate_pareto_frontier(df, x_col, y_col):
     return pareto_frontier_df[[x_col, y_col]].values
 
 def plot_file(file_path, ax, title):
-    df = pd.read_csv(file_path)
+    plot_prior(pd.read_csv(file_path), ax, title)
+
+def plot_prior(df, ax, title):
+    """Scatter plot of the languages in one prior's complexity DataFrame on ax."""
+    import matplotlib.pyplot as plt
+    df = df.copy()
 
     # Identify language types
     df['is_artificial'] = df['language'].str.startswith('artificial_language')
@@ -32,7 +44,7 @@ def plot_file(file_path, ax, title):
     categories = optimal_languages['language'].unique()
 
     # Generate distinct colors for each category
-    colors = cm.get_cmap('tab10', len(categories)).colors
+    colors = plt.get_cmap('tab10', len(categories)).colors
     color_mapping = dict(zip(categories, colors))  # Map each category to a color
 
     # Map the DataFrame's column to the corresponding colors
@@ -45,7 +57,8 @@ def plot_file(file_path, ax, title):
         color='red', 
         marker='^', 
         label='Natural Languages', 
-        alpha=0.8
+        alpha=0.8,
+        rasterized=True,
     )
     ax.scatter(
         artificial_languages['lexicon'], 
@@ -53,7 +66,8 @@ def plot_file(file_path, ax, title):
         color='black', 
         marker='o', 
         label='Artificial Languages', 
-        alpha=0.8
+        alpha=0.8,
+        rasterized=True,
     )
     ax.scatter(
         optimal_languages['lexicon'], 
@@ -62,7 +76,8 @@ def plot_file(file_path, ax, title):
         marker='*', 
         label='Optimal Languages', 
         s=100,  # Make stars larger
-        alpha=0.8
+        alpha=0.8,
+        rasterized=True,
     )
 
     # Calculate and plot Pareto frontier
@@ -84,19 +99,21 @@ def plot_file(file_path, ax, title):
 
  
 
-def main():
-    files = [
-        ("data/pl_complexity.csv", "PL Complexity"),
-        ("data/rev_complexity.csv", "Reversed PL Complexity"),
-        ("data/uni_complexity.csv", "Uniform Complexity")
-    ]
+def plot_priors(frames):
+    """Side by side scatter plots of (complexity DataFrame, title) pairs."""
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(1, len(frames), figsize=(6 * len(frames), 6), sharey=True, squeeze=False)
 
-    fig, axes = plt.subplots(1, 3, figsize=(18, 6), sharey=True)
-
-    for ax, (file_path, title) in zip(axes, files):
-        plot_file(file_path, ax, title)
+    for ax, (df, title) in zip(axes[0], frames):
+        plot_prior(df, ax, title)
 
     plt.tight_layout()
+    return fig
+
+def main():
+    import matplotlib.pyplot as plt
+    frames = [(read_analysis(file_path), title) for file_path, title in PRIOR_PLOT_FILES]
+    plot_priors(frames)
     plt.savefig('prior_scatterplots.png', dpi=1000)
     plt.show()
 
@@ -0,0 +1,121 @@
+import ast
+
+# Constructions are generated for the numbers 1 to UPPER_BOUND - 1. Change this to construct larger
+# numeral systems. Grammar ranges use the same exclusive stop, so [1, UPPER_BOUND] covers every number.
+UPPER_BOUND = 100
+NUMBERS = range(1, UPPER_BOUND)
+
+# Columns of the grammar csv files. Natural language files also have a 'type' column after 'language'.
+GRAMMAR_COLUMNS = ["language", "digits", "bases", "monomorphemics", "curr_bases", "number_addition_max",
+                   "number_subtraction_max", "phrase_subtraction", "exceptions"]
+
+class Grammar:
+    """
+    Language-specific grammar parsed from one row of a grammar csv file.
+    List columns are stored as (nested) Python lists in the same layout as the csv files.
+    parent is the name of the language this grammar was mutated from (None if it was not mutated
+    in this run). It is not written to the csv files.
+    """
+    __slots__ = ('language', 'type', 'digits', 'bases', 'monomorphemics', 'curr_bases',
+                 'number_addition_max', 'number_subtraction_max', 'phrase_subtraction', 'exceptions',
+                 'parent')
+
+    def __init__(self, language, digits, bases, monomorphemics, curr_bases, number_addition_max,
+                 number_subtraction_max, phrase_subtraction, exceptions, type='artificial', parent=None):
+        self.language = language
+        self.type = type
+        self.parent = parent
+        self.digits = digits
+        self.bases = bases
+        self.monomorphemics = monomorphemics
+        self.curr_bases = curr_bases
+        self.number_addition_max = number_addition_max
+        self.number_subtraction_max = number_subtraction_max
+        self.phrase_subtraction = phrase_subtraction
+        self.exceptions = exceptions
+
+    def __repr__(self):
+        return f"Grammar({self.language!r})"
+
+    def lexicon(self):
+        """Returns the digits, bases and monomorphemics as sets."""
+        return set(self.digits), set(self.bases), set(self.monomorphemics)
+
+    def to_row(self):
+        """Returns the grammar as a row of the grammar csv schema (without 'type')."""
+        return [self.language] + [str(getattr(self, column)) for column in GRAMMAR_COLUMNS[1:]]
+
+def is_range(value):
+    """
+    Returns if value is a range as used by in_ranges: [start, stop], [start, stop, increment]
+    or a list of such ranges.
+    """
+    if not isinstance(value, list) or not value:
+        return False
+    if isinstance(value[0], list):
+        return all(is_range(sub_range) for sub_range in value)
+    return len(value) in (2, 3) and all(isinstance(x, int) for x in value)
+
+def is_rule(value):
+    """Returns if value is a rule of the form [range, number]."""
+    return isinstance(value, list) and len(value) == 2 and is_range(value[0]) and isinstance(value[1], int)
+
+def is_exception(value):
+    """Returns if value is an exception of the form [number, range, construction]."""
+    return (isinstance(value, list) and len(value) == 3 and isinstance(value[0], int)
+            and is_range(value[1]) and isinstance(value[2], str))
+
+def is_number(value):
+    return isinstance(value, int)
+
+# Validator for the elements of each list column
+COLUMN_VALIDATORS = {
+    "digits": is_number,
+    "bases": is_number,
+    "monomorphemics": is_number,
+    "curr_bases": is_rule,
+    "number_addition_max": is_rule,
+    "number_subtraction_max": is_rule,
+    "phrase_subtraction": is_rule,
+    "exceptions": is_exception,
+}
+
+def parse_column(language, column, value):
+    """
+    Parses a list column of a grammar csv file. Only Python literals are accepted (no eval), and
+    every element is validated against the schema of the column.
+    """
+    if isinstance(value, list):
+        parsed = value
+    else:
+        try:
+            parsed = ast.literal_eval(str(value))
+        except (ValueError, SyntaxError):
+            raise ValueError(f"{language}: could not parse {column} = {value!r}")
+    if not isinstance(parsed, list) or not all(COLUMN_VALIDATORS[column](elem) for elem in parsed):
+        raise ValueError(f"{language}: invalid {column} = {value!r}")
+    return parsed
+
+def parse_grammar(row):
+    """Parses one row (dict or pandas Series) of a grammar csv file into a Grammar."""
+    language = row['language']
+    columns = {column: parse_column(language, column, row[column]) for column in GRAMMAR_COLUMNS[1:]}
+    return Grammar(language, type=row.get('type', 'artificial'), **columns)
+
+def parse_grammars(df):
+    """Parses every row of a grammar DataFrame."""
+    return [parse_grammar(row) for row in df.to_dict('records')]
+
+def read_grammars(path):
+    """Reads and parses a grammar csv file."""
+    import pandas as pd
+    return parse_grammars(pd.read_csv(path))
+
+def grammars_to_frame(grammars):
+    """Converts grammars back into a DataFrame with the grammar csv schema."""
+    import pandas as pd
+    return pd.DataFrame([grammar.to_row() for grammar in grammars], columns=GRAMMAR_COLUMNS)
+
+def write_grammars(grammars, path):
+    """Writes grammars to a grammar csv file."""
+    grammars_to_frame(grammars).to_csv(path, index=False)
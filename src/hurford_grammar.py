@@ -1,6 +1,14 @@
-from typing import List, Dict
+from typing import List
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
-import sys
+
+from grammar import NUMBERS, read_grammars
+from construction_store import write_constructions_npz
+from construction_cache import ConstructionCache, grammar_key
+from expression_table import ExpressionTable
 
 OUTPUT_DIR = "data"
 ARTIFICIAL_LANGUAGE_FILE = f"{OUTPUT_DIR}/artificial_language_grammars.csv"
@@ -13,18 +21,201 @@ FIRST_GEN_ART_LANG_FILE = f"{OUTPUT_DIR}/first_gen_artificial_language_grammars.
 
 NATURAL_PATH = f"{OUTPUT_DIR}/natural_language_grammars.csv"
 HURFORD_OUTPUT_FILE = f"{OUTPUT_DIR}/language_specific_constructions.csv"
+HURFORD_OUTPUT_NPZ_FILE = f"{OUTPUT_DIR}/language_specific_constructions.npz"
+
+# Number of worker processes used to generate constructions (1 = no process pool)
+NUM_WORKERS = 1
+
+# Number of chunks of grammars per worker process
+CHUNKS_PER_WORKER = 4
+
+# Reuse constructions of previously seen grammars from the on-disk cache (see construction_cache.py)
+USE_CACHE = True
+
+# Default node table that generate_numbers builds constructions in (see expression_table.py). It is shared
+# by every grammar constructed with it, so ConstructionTraces stay valid for mutants, and it is never
+# cleared: it grows with every new construction in the process. The evolution uses one table per run.
+EXPRESSIONS = ExpressionTable()
+
+# Construction of numbers that the grammar cannot construct
+ERR = "ERR"
+
+class ConstructionTrace:
+    """
+    Records how generate_numbers built the constructions of a grammar, so that the constructions
+    of a mutant can be rebuilt from it (see affected_numbers).
+    first_pass / second_pass: constructions (EXPRESSIONS node ids) of each number after its first / second pass.
+    touches: the numbers whose constructions (or exceptions) each number was built from.
+    """
+    __slots__ = ('grammar', 'target_range', 'first_pass', 'second_pass', 'touches', 'final_results')
+
+    def __init__(self, grammar, target_range):
+        self.grammar = grammar
+        self.target_range = target_range
+        self.first_pass = {}
+        self.second_pass = {}
+        self.touches = {n: set() for n in target_range}
+        self.final_results = None
+
+def exceptions_by_number(exceptions):
+    """Maps number to [range, construction] like generate_numbers does."""
+    return {exception[0]: [exception[1], exception[2]] for exception in exceptions}
+
+def affected_numbers(parent_trace, grammar, target_range):
+    """
+    Returns the numbers whose constructions can differ between the parent grammar of parent_trace and
+    its mutant grammar, or None if all of them have to be rebuilt. That is the case when the bases or
+    rules differ, since those change the phrases and rule ranges of every number. Otherwise, the numbers
+    whose lexical status or exception changed are affected, and so is every number built from an
+    affected number.
+    """
+    parent = parent_trace.grammar
+    if (parent_trace.target_range != target_range or set(parent.bases) != set(grammar.bases)
+            or parent.curr_bases != grammar.curr_bases
+            or parent.number_addition_max != grammar.number_addition_max
+            or parent.number_subtraction_max != grammar.number_subtraction_max):
+        return None
+
+    parent_exceptions = exceptions_by_number(parent.exceptions)
+    exceptions = exceptions_by_number(grammar.exceptions)
+    changed = set(parent.digits) ^ set(grammar.digits)
+    changed |= set(parent.monomorphemics) ^ set(grammar.monomorphemics)
+    changed |= {n for n in parent_exceptions.keys() | exceptions.keys()
+                if parent_exceptions.get(n) != exceptions.get(n)}
+
+    # Follow the touches of the parent backwards from the changed numbers
+    dependents = {n: [] for n in target_range}
+    for n, touched in parent_trace.touches.items():
+        for m in touched:
+            if m in dependents:
+                dependents[m].append(n)
+    affected = set()
+    stack = [n for n in changed if n in dependents]
+    while stack:
+        n = stack.pop()
+        if n not in affected:
+            affected.add(n)
+            stack.extend(dependents[n])
+    return affected
+
+class RuleTables:
+    """
+    A grammar's range rules compiled into dense lists indexed by number, so that generate_numbers
+    can look them up in O(1) instead of calling in_ranges for every rule and number.
+    bases / max_addends / max_subtrahands: current base, max addend and max subtrahand (-1 if none).
+    exception_masks: for every number with an exception, whether the exception applies to each number.
+    """
+    __slots__ = ('bases', 'max_addends', 'max_subtrahands', 'exception_masks')
+
+    def __init__(self, bases, max_addends, max_subtrahands, exception_masks):
+        self.bases = bases
+        self.max_addends = max_addends
+        self.max_subtrahands = max_subtrahands
+        self.exception_masks = exception_masks
+
+def range_intervals(rule_range, target_range):
+    """
+    Yields the [start, stop) intervals of numbers (clipped to 0 .. target_range.stop) for which
+    in_ranges(number, rule_range) holds, so that ranges can be painted onto tables instead of testing
+    every number.
+    """
+    size = target_range.stop
+    if not rule_range:
+        return
+
+    # Range containing a list of ranges
+    if isinstance(rule_range[0], list):
+        for sub_range in rule_range:
+            yield from range_intervals(sub_range, target_range)
+        return
+
+    start, stop = rule_range[0], rule_range[1]
+    if len(rule_range) == 3 and rule_range[2] <= 0:
+        # Unusual increment, fall back to checking every number
+        for number in range(size):
+            if in_ranges(number, rule_range):
+                yield number, number + 1
+        return
+
+    # Optional increment: the range [start, stop) repeats every inc numbers from start
+    block_start = start
+    while block_start < size:
+        if block_start + stop - start > 0:
+            yield max(block_start, 0), min(block_start + stop - start, size)
+        if len(rule_range) < 3:
+            break
+        block_start += rule_range[2]
+
+def range_mask(rule_range, target_range):
+    """
+    Returns a bytearray indexed by number (up to target_range.stop) of whether in_ranges(number, rule_range) holds.
+    """
+    mask = bytearray(target_range.stop)
+    for start, stop in range_intervals(rule_range, target_range):
+        if stop > start:
+            mask[start:stop] = b'\x01' * (stop - start)
+    return mask
+
+def rule_table(rules, target_range, first_match):
+    """
+    Compiles rules of the form [range, value] into a list indexed by number (-1 where no rule matches).
+    If first_match, the first matching rule wins, otherwise the last one does.
+    """
+    table = [-1] * target_range.stop
+    ordered_rules = reversed(rules) if first_match else rules
+    for rule_range, value in ordered_rules:
+        for start, stop in range_intervals(rule_range, target_range):
+            if stop > start:
+                table[start:stop] = [value] * (stop - start)
+    return table
+
+def compile_rules(target_range, curr_bases, number_addition_maxs, number_subtraction_maxs, exceptions_dict):
+    """
+    Compiles a grammar's range rules and exception ranges into RuleTables.
+    """
+    return RuleTables(
+        rule_table(curr_bases, target_range, first_match=False),
+        rule_table(number_addition_maxs, target_range, first_match=True),
+        rule_table(number_subtraction_maxs, target_range, first_match=True),
+        {number: range_mask(exception[0], target_range) for number, exception in exceptions_dict.items()},
+    )
 
 def generate_numbers(target_range: range, digits: list, bases: list, monomorphemic: list, 
                      curr_bases: list, number_addition_maxs: list, 
                      number_subtraction_maxs: list, phrase_subtraction: int, 
-                     exceptions: list) -> Dict[int, List[str]]:
+                     exceptions: list, trace: ConstructionTrace = None,
+                     reuse: tuple = None, expressions: ExpressionTable = None) -> List[int]:
     """
     Generates constructions for numbers in the target range using the given grammar.
+    Constructions are node ids in the ExpressionTable expressions (EXPRESSIONS by default). Returns a
+    list indexed by number of the final construction of each number (None if it has none).
+    If a ConstructionTrace is given, it is filled in while generating. reuse is a
+    (parent ConstructionTrace, affected numbers) pair: the constructions of all other
+    numbers are copied from the parent instead of being generated again.
     """
+    if expressions is None:
+        expressions = EXPRESSIONS
+
     # Initialize results dictionaries. results can store multiple possible constructions of a number.
     # final_results stores the final construction, so there should only be one per number.
     results = {i: set() for i in target_range}
-    final_results = [''] * (len(target_range) + 1)
+    final_results = [None] * target_range.stop
+
+    # Numbers whose constructions are copied from the parent
+    reused = set()
+    if reuse is not None:
+        parent_trace, affected = reuse
+        reused = set(target_range) - affected
+
+    # Number whose constructions are currently being built (for the trace)
+    building = [None]
+
+    def touch(number: int):
+        """
+        Records that the number being built uses the given number.
+        """
+        if trace is not None and building[0] is not None:
+            trace.touches[building[0]].add(number)
 
     # Initialize exceptions dictionary which maps number to a list containing the range and construction.
     try:
@@ -32,49 +223,24 @@ def generate_numbers(target_range: range, digits: list, bases: list, monomorphem
     except IndexError:
         print(f"INDEX OOB: Exception: {exceptions}")
         exit
+    exception_ids = {number: expressions.parse(exception[1]) for number, exception in exceptions_dict.items()}
 
-    def get_curr_base(number: int):
-        """
-        Gets the current base for the given argument.
-        """
-        possible_bases = []
-        
-        for elem in curr_bases:
-            if in_ranges(number, elem[0]):
-                possible_bases.append(elem[1])
-
-        if len(possible_bases) > 0:
-            return possible_bases[-1]
-        return -1
-    
-    def get_curr_max_addend(number: int):
-        """
-        Gets the current max addend (max NUMBER allowed in phrase + NUMBER) 
-        for the given argument.
-        """
-        for elem in number_addition_maxs:
-            if in_ranges(number, elem[0]):
-                return elem[1]
-        return -1
-    
-    def get_curr_max_subtrahand(number: int):
-        """
-        Gets the current max subtrahand (max NUMBER allowed in phrase - NUMBER) 
-        for the given argument.
-        """
-        for elem in number_subtraction_maxs:
-            if in_ranges(number, elem[0]):
-                return elem[1]
-        return -1
+    # Current base, max addend (max NUMBER allowed in phrase + NUMBER) and max subtrahand
+    # (max NUMBER allowed in phrase - NUMBER) of every number, and where each exception applies
+    rules = compile_rules(target_range, curr_bases, number_addition_maxs, number_subtraction_maxs, exceptions_dict)
+    curr_base_table = rules.bases
+    max_addend_table = rules.max_addends
+    max_subtrahand_table = rules.max_subtrahands
+    exception_masks = rules.exception_masks
 
-    def add_construction(number: int, expr: str, is_final = False):
+    def add_construction(number: int, expr: int, is_final = False):
         """
         Adds a new construction (expr) for the given number.
         is_final determines if this is the final construction of the number.
         """
         if not is_final and number in results:
             results[number].add(expr)
-        elif is_final and len(final_results[number]) == 0:
+        elif is_final and final_results[number] is None:
             final_results[number] = expr
 
     def add_phrase(n: int, cur_base: int):
@@ -83,41 +249,43 @@ def generate_numbers(target_range: range, digits: list, bases: list, monomorphem
         """
         if n % cur_base == 0:
             phrases.add(n)
-            if n in exceptions_dict and in_ranges(n, exceptions_dict[n][0]):
-                add_construction(n, exceptions_dict[n][1], is_final=True)
+            if n in exception_masks and exception_masks[n][n]:
+                add_construction(n, exception_ids[n], is_final=True)
             if n in monomorphemic:
                 return
 
             quotient = n // cur_base
+            touch(quotient)
+            touch(cur_base)
             if results[quotient] and quotient > 1:
-                quotient_constructions = results[quotient].copy()
-                base_constructions = results[cur_base].copy()
-                if quotient in exceptions_dict and in_ranges(n, exceptions_dict[quotient][0]):
-                    quotient_constructions = [exceptions_dict[quotient][1]]
-                if cur_base in exceptions_dict and in_ranges(n, exceptions_dict[cur_base][0]):
-                    base_constructions = [exceptions_dict[cur_base][1]]
+                quotient_constructions = results[quotient]
+                base_constructions = results[cur_base]
+                if quotient in exception_masks and exception_masks[quotient][n]:
+                    quotient_constructions = [exception_ids[quotient]]
+                if cur_base in exception_masks and exception_masks[cur_base][n]:
+                    base_constructions = [exception_ids[cur_base]]
                 for result in quotient_constructions:
                     for base_result in base_constructions:
-                        expr = f"({result} * {base_result})"
+                        expr = expressions.node('*', result, base_result)
                         add_construction(n, expr)
 
     # Add Digits
     for d in digits:
-        add_construction(d, str(d))
+        add_construction(d, expressions.leaf(str(d)))
         if d in exceptions_dict:
-            add_construction(d, exceptions_dict[d][1], is_final=True)
+            add_construction(d, exception_ids[d], is_final=True)
 
     # Add M
     for b in bases:
-        add_construction(b, str(b))
+        add_construction(b, expressions.leaf(str(b)))
         if b in exceptions_dict:
-            add_construction(b, exceptions_dict[b][1], is_final=True)
+            add_construction(b, exception_ids[b], is_final=True)
 
     # Add monomorphemics
     for mm in monomorphemic:
-        add_construction(mm, str(mm))
+        add_construction(mm, expressions.leaf(str(mm)))
         if mm in exceptions_dict:
-            add_construction(mm, exceptions_dict[mm][1], is_final=True)
+            add_construction(mm, exception_ids[mm], is_final=True)
 
     # Build Phrases
     phrases = set([])
@@ -127,10 +295,21 @@ def generate_numbers(target_range: range, digits: list, bases: list, monomorphem
 
     # Phrase = Number * M
     for n in target_range:  
-        cur_base = get_curr_base(n)
+        cur_base = curr_base_table[n]
         if cur_base == -1:
             continue
+        if n in reused:
+            if n % cur_base == 0:
+                phrases.add(n)
+            results[n] = set(parent_trace.first_pass[n])
+            if trace is not None:
+                trace.first_pass[n] = parent_trace.first_pass[n]
+            continue
+        building[0] = n
         add_phrase(n, cur_base)
+        if trace is not None:
+            trace.first_pass[n] = frozenset(results[n])
+    building[0] = None
 
     def generate_constructions(n: int):
         """
@@ -141,17 +320,18 @@ def generate_numbers(target_range: range, digits: list, bases: list, monomorphem
             return
 
         # Get current base, max addend, and max subtrahand
-        cur_base = get_curr_base(n)
-        cur_max_addend = get_curr_max_addend(n)
-        cur_max_subtrahand = get_curr_max_subtrahand(n)
+        cur_base = curr_base_table[n]
+        cur_max_addend = max_addend_table[n]
+        cur_max_subtrahand = max_subtrahand_table[n]
 
         if cur_base == -1:
             return
 
-        # Handle global exceptions
+        # Handle global exceptions (exceptions whose range covers the whole target range)
         if n in exceptions_dict:
-            if exceptions_dict[n][0][0] == 1 and exceptions_dict[n][0][1] == 100:
-                add_construction(n, exceptions_dict[n][1])
+            exception_range = exceptions_dict[n][0]
+            if exception_range[0] == target_range.start and exception_range[1] == target_range.stop:
+                add_construction(n, exception_ids[n])
             return
         
         # NOTE: Need to do this again for a language like Cahuilla which can't correctly construct 60 = (5 + 1) * 10
@@ -160,50 +340,75 @@ def generate_numbers(target_range: range, digits: list, bases: list, monomorphem
         # Phrase = Number * M
         add_phrase(n, cur_base)
 
-        # Loop through phrases to build numbers from addition and subtraction
-        for phrase in phrases:
-            # Addition: Phrase + Number
-            if phrase % cur_base == 0 and 0 < n - phrase < cur_max_addend:              
+        # Build numbers from addition and subtraction. Only multiples of the current base can be
+        # used as phrases, so instead of scanning every phrase, step through the multiples of
+        # cur_base within cur_max_addend below n and cur_max_subtrahand above n.
+        # Addition: Phrase + Number
+        if cur_max_addend > 1:
+            for phrase in range((n - cur_max_addend) // cur_base * cur_base + cur_base, n, cur_base):
+                if phrase not in phrases:
+                    continue
                 addend = n - phrase
+                touch(phrase)
+                touch(addend)
                 phrase_constructions = results[phrase]
                 addend_constructions = results[addend]
 
-                if phrase in exceptions_dict and in_ranges(n, exceptions_dict[phrase][0]):
-                    phrase_constructions = [exceptions_dict[phrase][1]]
-                if addend in exceptions_dict and in_ranges(n, exceptions_dict[addend][0]):
-                    addend_constructions = [exceptions_dict[addend][1]]
+                if phrase in exception_masks and exception_masks[phrase][n]:
+                    phrase_constructions = [exception_ids[phrase]]
+                if addend in exception_masks and exception_masks[addend][n]:
+                    addend_constructions = [exception_ids[addend]]
                 for phrase_expr in phrase_constructions:
                     for addend_expr in addend_constructions:
-                        expr = f"({phrase_expr} + {addend_expr})"
+                        expr = expressions.node('+', phrase_expr, addend_expr)
                         add_construction(n, expr)
 
-            # Subtraction: Phrase - Number
-            if cur_max_subtrahand > 0:
-                if phrase % cur_base == 0 and 0 < phrase - n < cur_max_subtrahand:
-                    subtrahand = phrase - n
-                    phrase_constructions = results[phrase]
-                    subtrahand_constructions = results[subtrahand]
-
-                    if phrase in exceptions_dict and in_ranges(n, exceptions_dict[phrase][0]):
-                        phrase_constructions = [exceptions_dict[phrase][1]]
-                    if subtrahand in exceptions_dict and in_ranges(n, exceptions_dict[subtrahand][0]):
-                        subtrahand_constructions = [exceptions_dict[subtrahand][1]]
-                    for phrase_expr in phrase_constructions:
-                        for subtrahand_expr in subtrahand_constructions:
-                            expr = f"({phrase_expr} - {subtrahand_expr})"
-                            add_construction(n, expr)
+        # Subtraction: Phrase - Number
+        if cur_max_subtrahand > 1:
+            for phrase in range((n // cur_base + 1) * cur_base, n + cur_max_subtrahand, cur_base):
+                if phrase not in phrases:
+                    continue
+                subtrahand = phrase - n
+                touch(phrase)
+                touch(subtrahand)
+                phrase_constructions = results[phrase]
+                subtrahand_constructions = results[subtrahand]
+
+                if phrase in exception_masks and exception_masks[phrase][n]:
+                    phrase_constructions = [exception_ids[phrase]]
+                if subtrahand in exception_masks and exception_masks[subtrahand][n]:
+                    subtrahand_constructions = [exception_ids[subtrahand]]
+                for phrase_expr in phrase_constructions:
+                    for subtrahand_expr in subtrahand_constructions:
+                        expr = expressions.node('-', phrase_expr, subtrahand_expr)
+                        add_construction(n, expr)
         
 
-    # Generate constructions for numbers 1 - 100    
+    # Generate constructions for the numbers in the target range
     for n in target_range:
+        if n in reused:
+            results[n] = set(parent_trace.second_pass[n])
+            if trace is not None:
+                trace.second_pass[n] = parent_trace.second_pass[n]
+                trace.touches[n] = parent_trace.touches[n]
+            continue
+        building[0] = n
         generate_constructions(n)
+        if trace is not None:
+            trace.second_pass[n] = frozenset(results[n])
+    building[0] = None
     
     for n in target_range:
+        if n in reused:
+            final_results[n] = parent_trace.final_results[n]
+            continue
         constructions = results[n]
-        if len(constructions) == 1 and len(final_results[n]) == 0:
+        if len(constructions) == 1 and final_results[n] is None:
             final_results[n] = constructions.pop()
-        elif len(constructions) > 1 and len(final_results[n]) == 0:
-            print(constructions)
+        elif len(constructions) > 1 and final_results[n] is None:
+            print({expressions.render(construction) for construction in constructions})
+    if trace is not None:
+        trace.final_results = list(final_results)
     return final_results
 
 
@@ -235,58 +440,223 @@ def in_ranges(number, range):
         return 0 <= relative_number < (stop - start)
     return False
 
-def generate_languages(grammars, language_constructions):
-    target_range = range(1, 100)
-    nrows = grammars.shape[0]
-    for i in range(nrows):
-        # Get row
-        language = grammars.iloc[i]
-
-        # Read each column
-        name = language['language']
-        digits = set(eval(language['digits']))
-        bases = set(eval(language['bases']))
-        monomorphemic = set(eval(language['monomorphemics']))
-        curr_bases = eval(language['curr_bases'])
-        number_addition_maxs = eval(language['number_addition_max'])
-        number_subtraction_maxs = eval(language['number_subtraction_max'])
-        phrase_subtraction = eval(language['phrase_subtraction'])
-        exceptions = eval(language['exceptions'])
-
-        # Generate numbers in range for specific language
-        final_results = generate_numbers(target_range, digits, bases, monomorphemic, curr_bases,
-                                        number_addition_maxs, number_subtraction_maxs, 
-                                        phrase_subtraction, exceptions)
-        
-        for i in target_range:
-            form = final_results[i]
-            if len(form) == 0:
-                form = "ERR"
-            language_constructions = pd.concat([language_constructions, pd.DataFrame([[name, i, form]], 
-                                                columns=language_constructions.columns)], ignore_index=True)
+def construct_language(grammar, target_range, traces=None, expressions=None):
+    """
+    Returns the final construction of every number in target_range for the grammar as node ids in
+    expressions (EXPRESSIONS by default). Numbers without a construction get the ERR leaf.
+    traces is an optional dict from language name to ConstructionTrace. The grammar's trace is added
+    to it, and if the grammar is a mutant of a language in traces, only the numbers affected by the
+    mutation are generated again. The traces have to belong to the same expressions.
+    """
+    if expressions is None:
+        expressions = EXPRESSIONS
+    digits, bases, monomorphemic = grammar.lexicon()
+
+    trace = None
+    reuse = None
+    if traces is not None:
+        trace = ConstructionTrace(grammar, target_range)
+        parent_trace = traces.get(grammar.parent)
+        if parent_trace is not None:
+            affected = affected_numbers(parent_trace, grammar, target_range)
+            if affected is not None:
+                reuse = (parent_trace, affected)
+
+    # Generate numbers in range for specific language
+    final_results = generate_numbers(target_range, digits, bases, monomorphemic, grammar.curr_bases,
+                                    grammar.number_addition_max, grammar.number_subtraction_max,
+                                    grammar.phrase_subtraction, grammar.exceptions, trace, reuse, expressions)
+    if traces is not None:
+        traces[grammar.language] = trace
+
+    err = expressions.leaf(ERR)
+    return [final_results[i] if final_results[i] is not None else err for i in target_range]
+
+def construct_chunk(grammars, target_range):
+    """
+    Worker process function. Constructs a chunk of grammars and returns all of their constructions
+    as a single newline-separated buffer and their token counts as an int32 buffer, which is much
+    cheaper to send back than Python objects.
+    """
+    forms = []
+    tokens = array('i')
+    rendered = {}
+    for grammar in grammars:
+        node_ids = construct_language(grammar, target_range)
+        forms.extend(EXPRESSIONS.render(node_id, rendered) for node_id in node_ids)
+        tokens.extend(EXPRESSIONS.tokens[node_id] for node_id in node_ids)
+    return "\n".join(forms).encode(), tokens.tobytes()
+
+def construct_languages(grammars, target_range, num_workers=NUM_WORKERS, cache=None, traces=None,
+                        expressions=None):
+    """
+    Returns the constructions of every grammar (a list of node ids in expressions per grammar, in the order
+    of grammars). If a ConstructionCache is given, grammars found in it are not generated again, and newly
+    generated ones are added to it. Constructions read from the cache or from worker processes are added to
+    expressions as leaves with their token count, so their strings are not split again.
+    With num_workers > 1, the grammars are split into chunks that are constructed in a process pool.
+    Otherwise, mutants are rebuilt from their parent's trace if traces is given (see construct_language).
+    Cache hits are not constructed, so they get no trace. If a hit is the parent of a grammar that has to be
+    generated, it is constructed anyway to record its trace. The process pool does not use traces: node ids
+    are only valid in the process that built them, so the workers rebuild every number.
+    """
+    if expressions is None:
+        expressions = EXPRESSIONS
+    grammars = list(grammars)
+    all_constructions = [None] * len(grammars)
+
+    # Look up the grammars in the cache before generating anything
+    if cache is not None:
+        keys = [grammar_key(grammar, target_range) for grammar in grammars]
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            if key in cached:
+                forms, tokens = cached[key]
+                all_constructions[i] = [expressions.leaf(form, count) for form, count in zip(forms, tokens)]
+        cache.hits += len(grammars) - all_constructions.count(None)
+        cache.misses += all_constructions.count(None)
+
+    missing = [i for i in range(len(grammars)) if all_constructions[i] is None]
+    missing_grammars = [grammars[i] for i in missing]
+    use_pool = num_workers > 1 and len(missing_grammars) >= 2
+    if traces is not None and not use_pool:
+        # Record the traces of cached parents (e.g. survivors after --resume or on a warm cache)
+        missing_parents = {grammar.parent for grammar in missing_grammars}
+        for i, grammar in enumerate(grammars):
+            if all_constructions[i] is not None and grammar.language in missing_parents and grammar.language not in traces:
+                construct_language(grammar, target_range, traces, expressions)
+
+    if not use_pool:
+        generated = [construct_language(grammar, target_range, traces, expressions) for grammar in missing_grammars]
+    else:
+        chunk_size = -(-len(missing_grammars) // (num_workers * CHUNKS_PER_WORKER))
+        chunks = [missing_grammars[i:i + chunk_size] for i in range(0, len(missing_grammars), chunk_size)]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            # map returns the buffers in the order of the chunks, so the output order is deterministic
+            buffers = list(executor.map(construct_chunk, chunks, repeat(target_range)))
+
+        forms = [form for buffer, _ in buffers for form in buffer.decode().split("\n")]
+        tokens = array('i')
+        for _, token_buffer in buffers:
+            tokens.frombytes(token_buffer)
+        node_ids = [expressions.leaf(form, count) for form, count in zip(forms, tokens)]
+        n = len(target_range)
+        generated = [node_ids[i * n:(i + 1) * n] for i in range(len(missing_grammars))]
+
+    for i, constructions in zip(missing, generated):
+        all_constructions[i] = constructions
+    if cache is not None and missing:
+        rendered = {}
+        cache.put_many([(keys[i], [expressions.render(node_id, rendered) for node_id in all_constructions[i]],
+                         [expressions.tokens[node_id] for node_id in all_constructions[i]]) for i in missing])
+    return all_constructions
+
+# Columns of the language constructions DataFrames. Until they are written, constructions are node ids
+# (see render_constructions). The constructions file has the same columns without tokens.
+CONSTRUCTION_COLUMNS = ['language', 'number', 'tokens', 'constructions']
+
+def generate_languages(grammars, language_constructions=None, num_workers=NUM_WORKERS, cache=None, traces=None,
+                       target_range=NUMBERS, expressions=None):
+    """
+    Generates the constructions of the grammars for the numbers in target_range as a DataFrame with one
+    row per language and number, appended to language_constructions if it is given. constructions are
+    node ids in expressions (EXPRESSIONS by default) and tokens are their token counts, which is what
+    analyse_languages scores. The rows are gathered in column lists and the DataFrame is built once.
+    """
+    if expressions is None:
+        expressions = EXPRESSIONS
+    all_constructions = construct_languages(grammars, target_range, num_workers, cache, traces, expressions)
+
+    names = []
+    numbers = []
+    constructions = []
+    for grammar, node_ids in zip(grammars, all_constructions):
+        names.extend([grammar.language] * len(target_range))
+        numbers.extend(target_range)
+        constructions.extend(node_ids)
+    tokens = [expressions.tokens[node_id] for node_id in constructions]
+    new_constructions = pd.DataFrame({'language': names, 'number': numbers, 'tokens': tokens,
+                                      'constructions': constructions}, columns=CONSTRUCTION_COLUMNS)
+
+    if language_constructions is None or language_constructions.empty:
+        return new_constructions
+    return pd.concat([language_constructions, new_constructions], ignore_index=True)
+
+def construct_generation(artificial_language_grammars, is_last_gen=False,
+                         natural_language_grammars=None, first_gen_art_lang_grammars=None,
+                         num_workers=NUM_WORKERS, cache=None, traces=None, target_range=NUMBERS, expressions=None):
+    """
+    Generates constructions for one generation of artificial languages. On the last generation,
+    the natural and first generation languages are constructed as well.
+    """
+    frames = [generate_languages(artificial_language_grammars, None, num_workers, cache, traces, target_range,
+                                 expressions)]
+
+    if is_last_gen:
+        if natural_language_grammars is not None:
+            frames.append(generate_languages(natural_language_grammars, None, num_workers, cache,
+                                             target_range=target_range, expressions=expressions))
+        if first_gen_art_lang_grammars is not None:
+            frames.append(generate_languages(first_gen_art_lang_grammars, None, num_workers, cache,
+                                             target_range=target_range, expressions=expressions))
+    return pd.concat(frames, ignore_index=True)
+
+def render_constructions(language_constructions, expressions=None):
+    """Returns a copy of a DataFrame from generate_languages with the constructions rendered to strings."""
+    if expressions is None:
+        expressions = EXPRESSIONS
+    rendered = {}
+    language_constructions = language_constructions.copy()
+    language_constructions['constructions'] = [expressions.render(node_id, rendered)
+                                               for node_id in language_constructions['constructions']]
     return language_constructions
-            
 
-def main():
-    is_last_gen = bool(sys.argv[1])
+def write_constructions(language_constructions, output_format='csv', expressions=None):
+    """
+    Writes language constructions from generate_languages (node ids in expressions) as csv, as a columnar
+    npz file (see construction_store.py), or both. This is the only place their strings are rendered.
+    """
+    language_constructions = render_constructions(language_constructions, expressions)
+    if output_format in ('csv', 'both'):
+        language_constructions[['language', 'number', 'constructions']].to_csv(HURFORD_OUTPUT_FILE, index=False)
+    if output_format in ('npz', 'both'):
+        write_constructions_npz(language_constructions, HURFORD_OUTPUT_NPZ_FILE)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate the constructions of every language.")
+    parser.add_argument('is_last_gen', type=int, choices=(0, 1), metavar='is_last_gen',
+                        help="1 if this is the last generation, which also constructs the natural and first "
+                             "generation languages")
+    parser.add_argument('output_format', nargs='?', choices=('csv', 'npz', 'both'), default='csv',
+                        metavar='output_format',
+                        help="csv, npz or both (default csv)")
+    parser.add_argument('num_workers', nargs='?', type=int, default=NUM_WORKERS,
+                        help=f"number of worker processes (default {NUM_WORKERS})")
+    args = parser.parse_args(args)
+    is_last_gen = bool(args.is_last_gen)
+    output_format = args.output_format
+    num_workers = args.num_workers
 
     # Read language-specifics from file
     #natural_language_grammars = pd.read_csv(NATURAL_PATH)
-    artificial_language_grammars = pd.read_csv(ARTIFICIAL_LANGUAGE_FILE)
+    artificial_language_grammars = read_grammars(ARTIFICIAL_LANGUAGE_FILE)
     #first_gen_art_lang_grammars = pd.read_(FIRST_GEN_ARTIFICIAL_PATH)
 
-    language_constructions = pd.DataFrame(columns=['language', 'number', 'constructions'])
-    #language_constructions = generate_languages(natural_language_grammars, language_constructions)
-    language_constructions = generate_languages(artificial_language_grammars, language_constructions)
-
+    natural_language_grammars = None
+    first_gen_art_lang_grammars = None
     if is_last_gen:
-        natural_language_grammars = pd.read_csv(NATURAL_PATH)
-        first_gen_art_lang_grammars = pd.read_csv(FIRST_GEN_ART_LANG_FILE)
-        language_constructions = generate_languages(natural_language_grammars, language_constructions)
-        language_constructions = generate_languages(first_gen_art_lang_grammars, language_constructions)
+        natural_language_grammars = read_grammars(NATURAL_PATH)
+        first_gen_art_lang_grammars = read_grammars(FIRST_GEN_ART_LANG_FILE)
+
+    cache = ConstructionCache() if USE_CACHE else None
+    language_constructions = construct_generation(artificial_language_grammars, is_last_gen,
+                                                  natural_language_grammars, first_gen_art_lang_grammars,
+                                                  num_workers, cache)
+    if cache is not None:
+        cache.close()
 
-    # Write data to csv file
-    language_constructions.to_csv(HURFORD_OUTPUT_FILE, index=False)
+    # Write data to file
+    write_constructions(language_constructions, output_format)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
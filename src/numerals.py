@@ -0,0 +1,48 @@
+import argparse
+import importlib
+import sys
+
+# Subcommands and the script whose main() each one runs. Scripts are only imported when their subcommand
+# runs, so the heavy libraries (pandas, matplotlib, seaborn, scipy) are not loaded for --help or by the
+# subcommands that do not use them.
+COMMANDS = {
+    'generate': ("artificial_language_generation", "generate or mutate a generation of artificial languages"),
+    'construct': ("hurford_grammar", "generate the constructions of every language"),
+    'analyse': ("complexity_analysis", "calculate lexicon size and avg_ms_complexity of every language"),
+    'evolve': ("artificial_language_evolution", "evolve artificial languages"),
+    'plot': ("render_figures", "draw the figures (preview or final)"),
+}
+
+# Analyses of the stats subcommand
+STATS = {
+    'sums': ("sum_optimization", "optimal lambda of S(L), or bootstrap intervals"),
+    'priors': ("prior_significance", "significance tests of the distances under different priors"),
+    'sweep': ("prior_sweep", "distances to the optimal frontier under a family of priors"),
+    'frontier': ("frontier_search", "exact frontier by branch-and-bound search"),
+}
+
+def run(module_name, args):
+    """Imports a script and runs its main() with the given command-line arguments."""
+    return importlib.import_module(module_name).main(args)
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="numerals", description="Recursive numeral system pipeline.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, (module_name, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=description, add_help=False)
+        subparser.set_defaults(module_name=module_name)
+    stats_parser = subparsers.add_parser('stats', help="statistics of the analysis")
+    stats_subparsers = stats_parser.add_subparsers(dest='analysis', required=True)
+    for analysis, (module_name, description) in STATS.items():
+        subparser = stats_subparsers.add_parser(analysis, help=description, add_help=False)
+        subparser.set_defaults(module_name=module_name)
+    return parser
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    # The arguments after the subcommand are passed on to the script unchanged (see the README of each script)
+    parsed, script_args = make_parser().parse_known_args(args)
+    run(parsed.module_name, script_args)
+
+if __name__ == "__main__":
+    main()
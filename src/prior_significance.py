@@ -1,126 +1,196 @@
+import argparse
+import itertools
+import os
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from scipy.stats import ttest_rel, binomtest
 
-# Load data
-pl_data = pd.read_csv("data/pl_complexity.csv")
-uni_data = pd.read_csv("data/uni_complexity.csv")
-rev_data = pd.read_csv("data/rev_complexity.csv")
+from analysis_data import read_analysis
+from prior_sweep import frontier_distances
+
+# Complexity files of the priors to compare, by prior name. Other files can be given on the command line
+# as name=path. Pairs are tested in this order, e.g. Power-law vs Uniform.
+PRIOR_FILES = {
+    'Power-law': "data/pl_complexity.csv",
+    'Uniform': "data/uni_complexity.csv",
+    'Reverse power-law': "data/rev_complexity.csv",
+}
+
+SIGNIFICANCE_OUTPUT_FILE = "data/prior_significance.csv"
+
+# Permutation tests enumerate every sign flip of the paired differences if there are at most
+# EXACT_PERMUTATION_MAX languages, and draw PERMUTATIONS random sign flips otherwise
+EXACT_PERMUTATION_MAX = 16
+PERMUTATIONS = 100000
+PERMUTATION_SEED = 0
+# Number of sign flips multiplied at once
+PERMUTATION_CHUNK = 5000
 
-# Function to calculate distances for a single file
 def calculate_distances(df):
-    # Separate natural and artificial languages
-    natural_langs = df[df['type'] != 'artificial']
-    artificial_langs = df[df['type'] == 'artificial']
-    
-    # Find the optimal artificial language (smallest avg_ms_complexity) for each lexicon size
-    optimal_artificial = (
-        artificial_langs
-        .groupby('lexicon', as_index=False)['avg_ms_complexity']
-        .min()
-        .rename(columns={'avg_ms_complexity': 'optimal_avg_ms_complexity'})
-    )
-    
-    # Merge the optimal artificial data with natural languages on lexicon size
-    merged = natural_langs.merge(optimal_artificial, on='lexicon', how='left')
-    
-    # Calculate the distance
-    merged['distance_to_optimal'] = abs(merged['avg_ms_complexity'] - merged['optimal_avg_ms_complexity'])
-    
-    # Return the merged DataFrame with distances
-    return merged[['language', 'lexicon', 'avg_ms_complexity', 'optimal_avg_ms_complexity', 'distance_to_optimal']]
-
-# Process all files and store results
-pl_result = calculate_distances(pl_data)
-rev_result = calculate_distances(rev_data)
-uni_result = calculate_distances(uni_data)
-
-merged_power_reverse = pl_result.merge(
-    rev_result,
-    on="language",
-    suffixes=("_power", "_reverse")
-)
-
-# Perform the t-test
-test_power_reverse = ttest_rel(
-    merged_power_reverse["distance_to_optimal_power"],
-    merged_power_reverse["distance_to_optimal_reverse"], alternative='less'
-)
-
-print("Paired t-test: Power-law vs Reverse Power-law")
-print(f"t-statistic: {test_power_reverse.statistic:.4f}, p-value: {test_power_reverse.pvalue:.4e}")
-
-# Merge for paired t-test: Power-law vs Uniform
-merged_power_uniform = pl_result.merge(
-    uni_result,
-    on="language",
-    suffixes=("_power", "_uniform")
-)
-
-# Perform the t-test
-test_power_uniform = ttest_rel(
-    merged_power_uniform["distance_to_optimal_power"],
-    merged_power_uniform["distance_to_optimal_uniform"], alternative='less'
-)
-
-print("\nPaired t-test: Power-law vs Uniform")
-print(f"t-statistic: {test_power_uniform.statistic:.4f}, p-value: {test_power_uniform.pvalue:.4e}")
-
-# Calculate the signs of the differences
-merged_power_uniform['sign'] = (
-    merged_power_uniform['distance_to_optimal_power'] < 
-    merged_power_uniform['distance_to_optimal_uniform']
-)
-
-# Count positives and negatives
-uni_positive_signs = merged_power_uniform['sign'].sum()  # Count where Power < Uniform
-uni_total_nonzero = merged_power_uniform['sign'].notna().sum()  # Ignore zero differences
-
-# Run a one-sided sign test (testing if positives are more frequent)
-uni_sign_test_result = binomtest(uni_positive_signs, uni_total_nonzero, p=0.5, alternative='greater')
-
-print("\n\nNon-parametric Sign Test: Power-law vs Uniform (Power < Uniform)")
-print(f"Number of positive signs: {uni_positive_signs}/{uni_total_nonzero}")
-print(f"p-value: {uni_sign_test_result.pvalue:.4e}")
-
-# Calculate the signs of the differences
-merged_power_reverse['sign'] = (
-    merged_power_reverse['distance_to_optimal_power'] < 
-    merged_power_reverse['distance_to_optimal_reverse']
-)
-
-# Count positives and negatives
-rev_positive_signs = merged_power_reverse['sign'].sum()  # Count where Power < Reverese
-rev_total_nonzero = merged_power_reverse['sign'].notna().sum()  # Ignore zero differences
-
-# Run a one-sided sign test (testing if positives are more frequent)
-rev_sign_test_result = binomtest(rev_positive_signs, rev_total_nonzero, p=0.5, alternative='greater')
-
-print("\nNon-parametric Sign Test: Power-law vs Reverse (Power < Reverse)")
-print(f"Number of positive signs: {rev_positive_signs}/{rev_total_nonzero}")
-print(f"p-value: {rev_sign_test_result.pvalue:.4e}")
-
-# Set priors
-pl_result['prior'] = 'Power-law'
-uni_result['prior'] = 'Uniform'
-rev_result['prior'] = 'Reverse power-law'
-
-# Loop through each dataset and create a plot
-fig, axes = plt.subplots(1, 1, figsize=(6, 4))
-
-combined = pd.concat([pl_result, uni_result, rev_result], axis=0)
-
-# Make Mandarin different color
-combined['color'] = combined['language'].apply(lambda x: 'red' if x == 'mandarin' else 'blue')
-palette = {'red': 'red', 'blue': '#1f77b4'}
-
-sns.swarmplot(x='prior', y='distance_to_optimal', data=combined, ax=axes, hue='color', palette=palette, size=7, edgecolor='gray', linewidth=1, legend=False)
-axes.set_xlabel(None)
-axes.set_ylabel('Deviation from optimality (log scale)')
-axes.set_ylim(0, 20)
-axes.set_yscale('symlog', linthresh=1e-3)
-
-plt.savefig('images/priors_comparison.png', dpi=1000)
-plt.show()
+    """
+    Returns the natural languages of a complexity DataFrame with the avg_ms_complexity of the optimal (least
+    complex) artificial language of the same lexicon size and the distance to it.
+    """
+    return calculate_all_distances({'': df}).drop(columns='prior')
+
+def calculate_all_distances(prior_results):
+    """
+    calculate_distances for any number of priors. prior_results maps prior name to a complexity DataFrame.
+    The files of different priors can hold different artificial languages, so their rows are stacked into one
+    rows x priors matrix with every complexity in the column of its prior (NaN elsewhere), and the optimal
+    artificial language of every lexicon size is found for all priors at once with prior_sweep.frontier_distances.
+    Returns the distances of all priors in one DataFrame with a 'prior' column.
+    """
+    stacked = pd.concat(prior_results, names=['prior']).reset_index(level='prior').reset_index(drop=True)
+    prior_ids, priors = pd.factorize(stacked['prior'])
+    rows = np.arange(len(stacked))
+    complexities = np.full((len(stacked), len(priors)), np.nan)
+    complexities[rows, prior_ids] = stacked['avg_ms_complexity'].to_numpy(dtype=float)
+
+    is_artificial = (stacked['type'] == 'artificial').to_numpy()
+    optimal_complexities, distances = frontier_distances(stacked['lexicon'].to_numpy(), is_artificial, complexities)
+    stacked['optimal_avg_ms_complexity'] = optimal_complexities[rows, prior_ids]
+    stacked['distance_to_optimal'] = distances[rows, prior_ids]
+    return stacked.loc[~is_artificial, ['prior', 'language', 'lexicon', 'avg_ms_complexity', 'optimal_avg_ms_complexity',
+                                        'distance_to_optimal']].reset_index(drop=True)
+
+def distance_matrix(distances, priors):
+    """Returns a languages x priors matrix of distances, for the languages that all priors have."""
+    matrix = distances.pivot_table(index='language', columns='prior', values='distance_to_optimal', sort=False)
+    return matrix[list(priors)].dropna()
+
+def holm_correction(pvalues):
+    """Returns Holm-Bonferroni adjusted p-values."""
+    pvalues = np.asarray(pvalues, dtype=float)
+    order = np.argsort(pvalues)
+    m = len(pvalues)
+    adjusted = np.maximum.accumulate(pvalues[order] * (m - np.arange(m)))
+    result = np.empty(m)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+def sign_tests(differences, alternative='less'):
+    """
+    Sign tests for every column of a languages x pairs matrix of paired differences (first - second prior).
+    Zero differences are left out. alternative='less' tests if the first prior's distances are smaller
+    more often, 'two-sided' if either is. Returns the number of languages with a smaller distance
+    under the first prior, the number of nonzero differences and the p-values.
+    """
+    from scipy.stats import binom
+    positive_signs = (differences < 0).sum(axis=0)
+    total_nonzero = (differences != 0).sum(axis=0)
+    if alternative == 'less':
+        pvalues = binom.sf(positive_signs - 1, total_nonzero, 0.5)
+    else:
+        pvalues = np.minimum(1.0, 2 * np.minimum(binom.cdf(positive_signs, total_nonzero, 0.5),
+                                                 binom.sf(positive_signs - 1, total_nonzero, 0.5)))
+    return positive_signs, total_nonzero, pvalues
+
+def permutation_tests(differences, alternative='less', num_permutations=PERMUTATIONS, seed=PERMUTATION_SEED):
+    """
+    Paired permutation tests of the mean difference for every column of a languages x pairs matrix.
+    Under the null hypothesis, the sign of each paired difference is random, so the same sign flips
+    are applied to all pairs as one (flips x languages) @ (languages x pairs) product. With at most
+    EXACT_PERMUTATION_MAX languages, every sign flip is enumerated (exact test). Otherwise, the
+    observed signs plus num_permutations random flips are used (Monte Carlo).
+    """
+    n = differences.shape[0]
+    if n <= EXACT_PERMUTATION_MAX:
+        signs = 1 - 2 * ((np.arange(2 ** n)[:, None] >> np.arange(n)[None, :]) & 1)
+    else:
+        rng = np.random.default_rng(seed)
+        signs = rng.choice(np.array([-1, 1], dtype=np.int8), size=(num_permutations, n))
+        signs = np.vstack([np.ones((1, n), dtype=np.int8), signs])
+
+    # Count the flips with a mean at least as extreme as the observed one, in chunks of flips to bound memory
+    observed = differences.mean(axis=0)
+    extreme = np.zeros(differences.shape[1])
+    for start in range(0, len(signs), PERMUTATION_CHUNK):
+        permuted = signs[start:start + PERMUTATION_CHUNK] @ differences / n
+        if alternative == 'less':
+            extreme += (permuted <= observed[None, :] + 1e-12).sum(axis=0)
+        else:
+            extreme += (np.abs(permuted) >= np.abs(observed)[None, :] - 1e-12).sum(axis=0)
+    return observed, extreme / len(signs)
+
+def compare_priors(distances, priors, alternative='less', num_permutations=PERMUTATIONS, seed=PERMUTATION_SEED):
+    """
+    Runs sign tests and permutation tests for all pairs of priors (in the order of priors) at once,
+    with Holm correction across the pairs of each test. Returns one row per pair.
+    """
+    matrix = distance_matrix(distances, priors)
+    pairs = list(itertools.combinations(range(len(priors)), 2))
+    values = matrix.to_numpy()
+    first = [a for a, _ in pairs]
+    second = [b for _, b in pairs]
+    differences = values[:, first] - values[:, second]
+
+    positive_signs, total_nonzero, sign_pvalues = sign_tests(differences, alternative)
+    mean_differences, permutation_pvalues = permutation_tests(differences, alternative, num_permutations, seed)
+    return pd.DataFrame({
+        'prior_a': [priors[a] for a in first],
+        'prior_b': [priors[b] for b in second],
+        'languages': len(matrix),
+        'positive_signs': positive_signs,
+        'total_nonzero': total_nonzero,
+        'sign_p': sign_pvalues,
+        'sign_p_holm': holm_correction(sign_pvalues),
+        'mean_difference': mean_differences,
+        'permutation_p': permutation_pvalues,
+        'permutation_p_holm': holm_correction(permutation_pvalues),
+    })
+
+def plot_distances(distances):
+    """Swarm plot of the distances of every prior (Figure 4 in paper)."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, axes = plt.subplots(1, 1, figsize=(6, 4))
+
+    combined = distances.copy()
+    # Make Mandarin different color
+    combined['color'] = combined['language'].apply(lambda x: 'red' if x == 'mandarin' else 'blue')
+    palette = {'red': 'red', 'blue': '#1f77b4'}
+
+    sns.swarmplot(x='prior', y='distance_to_optimal', data=combined, ax=axes, hue='color', palette=palette, size=7, edgecolor='gray', linewidth=1, legend=False,
+                  rasterized=True)
+    axes.set_xlabel(None)
+    axes.set_ylabel('Deviation from optimality (log scale)')
+    axes.set_ylim(0, 20)
+    axes.set_yscale('symlog', linthresh=1e-3)
+    return fig
+
+def prior_file(arg):
+    """Parses a name=path command-line argument into a (name, path) pair."""
+    name, separator, path = arg.partition('=')
+    if not separator or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected name=path, got {arg!r}")
+    return name, path
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Test the distances from the optimal frontier under different "
+                                                 "priors against each other.")
+    parser.add_argument('prior_files', nargs='*', type=prior_file, metavar='name=path',
+                        help="complexity csv file of a prior (default PRIOR_FILES: "
+                             + ", ".join(f"{name}={path}" for name, path in PRIOR_FILES.items()) + ")")
+    args = parser.parse_args(args)
+    prior_files = dict(args.prior_files) if args.prior_files else PRIOR_FILES
+    for path in prior_files.values():
+        if not os.path.exists(path):
+            parser.error(f"complexity file {path} does not exist")
+    priors = list(prior_files)
+    import matplotlib.pyplot as plt
+
+    # Load data
+    prior_results = {prior: read_analysis(path) for prior, path in prior_files.items()}
+    distances = calculate_all_distances(prior_results)
+
+    results = compare_priors(distances, priors)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(results)
+    results.to_csv(SIGNIFICANCE_OUTPUT_FILE, index=False)
+
+    plot_distances(distances)
+    plt.savefig('images/priors_comparison.png', dpi=1000)
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+from grammar import NUMBERS, read_grammars
+from complexity_analysis import (ARTIFICIAL_LANGUAGE_FILE, FIRST_GEN_ART_LANG_FILE, NATURAL_GRAMMAR_PATH,
+                                 analyse_languages, frequency_weight_matrix, power_law_weight_matrix,
+                                 read_language_constructions, token_count_matrix)
+
+OUTPUT_DIR = "data"
+SWEEP_OUTPUT_FILE = f"{OUTPUT_DIR}/prior_sweep.csv"
+SWEEP_SUMMARY_FILE = f"{OUTPUT_DIR}/prior_sweep_summary.csv"
+
+# Default sweep: power law exponents from SWEEP_START to SWEEP_STOP (inclusive) in steps of SWEEP_STEP
+SWEEP_START = 0.0
+SWEEP_STOP = 4.0
+SWEEP_STEP = 0.05
+
+def power_law_exponents(start=SWEEP_START, stop=SWEEP_STOP, step=SWEEP_STEP):
+    """Returns the exponents from start to stop (inclusive) in steps of step."""
+    return np.round(np.arange(start, stop + step / 2, step), 10)
+
+def frontier_distances(lexicons, is_artificial, complexities):
+    """
+    For a languages x priors matrix of avg_ms_complexity, returns the complexity of the optimal artificial
+    language with the same lexicon size as every language (like prior_significance.calculate_distances)
+    and the distance to it, both as languages x priors matrices. All priors are done at once: the minimum
+    of every lexicon size is accumulated with np.fmin.at. Lexicon sizes without artificial languages give NaN.
+    """
+    lexicon_ids, _ = pd.factorize(lexicons)
+    optimal = np.full((lexicon_ids.max() + 1, complexities.shape[1]), np.nan)
+    np.fmin.at(optimal, lexicon_ids[is_artificial], complexities[is_artificial])
+    optimal_complexities = optimal[lexicon_ids]
+    return optimal_complexities, np.abs(complexities - optimal_complexities)
+
+def sweep_priors(language_analysis, language_token_counts, weights, priors):
+    """
+    Scores every language of language_analysis (from analyse_languages) under every prior at once, as one
+    languages x numbers token count matrix (language_token_counts, from token_count_matrix) times a
+    numbers x priors weight matrix. Returns one row per prior and language with its avg_ms_complexity
+    and the distance to the optimal artificial language.
+    """
+    languages, token_counts = language_token_counts
+    complexities = token_counts @ weights
+
+    # Rows of language_analysis without constructions get complexity 0, like in analyse_languages
+    rows = pd.Index(languages).get_indexer(language_analysis['language'])
+    complexities = np.where(rows[:, None] >= 0, complexities[rows], 0.0)
+
+    is_artificial = (language_analysis['type'] == 'artificial').to_numpy()
+    optimal_complexities, distances = frontier_distances(language_analysis['lexicon'].to_numpy(), is_artificial,
+                                                         complexities)
+
+    num_languages, num_priors = complexities.shape
+    return pd.DataFrame({
+        'prior': np.repeat(np.asarray(priors, dtype=object), num_languages),
+        'language': np.tile(language_analysis['language'].to_numpy(), num_priors),
+        'type': np.tile(language_analysis['type'].to_numpy(), num_priors),
+        'lexicon': np.tile(language_analysis['lexicon'].to_numpy(), num_priors),
+        'avg_ms_complexity': complexities.T.ravel(),
+        'optimal_avg_ms_complexity': optimal_complexities.T.ravel(),
+        'distance_to_optimal': distances.T.ravel(),
+    })
+
+def summarise_sweep(sweep):
+    """Returns the mean and median distance to optimal of the natural languages under every prior."""
+    natural_languages = sweep[sweep['type'] != 'artificial']
+    return (natural_languages
+            .groupby('prior', sort=False)['distance_to_optimal']
+            .agg(mean_distance='mean', median_distance='median')
+            .reset_index())
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Score all languages under a family of priors and report their "
+                                                 "distances from the optimal frontier.",
+                                     usage="%(prog)s [-h] [start stop [step] | frequency_file]")
+    parser.add_argument('sweep', nargs='*', metavar='start stop [step] | frequency_file',
+                        help=f"power law exponents from start to stop (inclusive) in steps of step (default "
+                             f"{SWEEP_START:g} {SWEEP_STOP:g} {SWEEP_STEP:g}), or a frequency table csv file with "
+                             f"a number column and one column of frequencies per prior")
+    sweep = parser.parse_args(args).sweep
+    if len(sweep) > 3:
+        parser.error("expected start stop [step] or a frequency file")
+    numbers = NUMBERS
+    if len(sweep) == 1:
+        if not os.path.exists(sweep[0]):
+            parser.error(f"frequency file {sweep[0]} does not exist")
+        weights, priors = frequency_weight_matrix(pd.read_csv(sweep[0]), numbers)
+    else:
+        try:
+            bounds = [float(arg) for arg in sweep]
+        except ValueError:
+            parser.error(f"invalid exponents {' '.join(sweep)}, expected start stop [step]")
+        exponents = power_law_exponents(*bounds)
+        weights = power_law_weight_matrix(exponents, numbers)
+        priors = [f"pl_{exponent:g}" for exponent in exponents]
+
+    # Read language-specifics from file
+    natural_language_grammars = read_grammars(NATURAL_GRAMMAR_PATH)
+    artificial_language_grammars = read_grammars(ARTIFICIAL_LANGUAGE_FILE)
+    first_gen_language_grammars = read_grammars(FIRST_GEN_ART_LANG_FILE)
+    all_language_constructions = read_language_constructions()
+
+    # The token counts are built once, for the analysis and the sweep
+    language_token_counts = token_count_matrix(all_language_constructions, numbers)
+    language_analysis = analyse_languages(all_language_constructions, artificial_language_grammars,
+                                          natural_language_grammars, first_gen_language_grammars, numbers=numbers,
+                                          language_token_counts=language_token_counts)
+    sweep = sweep_priors(language_analysis, language_token_counts, weights, priors)
+    summary = summarise_sweep(sweep)
+    print(summary.to_string(index=False))
+
+    sweep.to_csv(SWEEP_OUTPUT_FILE, index=False)
+    summary.to_csv(SWEEP_SUMMARY_FILE, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+import matplotlib
+# Draw without a display, before pyplot is imported by the plotting scripts
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import generate_plots
+import generate_prior_plots
+import prior_significance
+import sum_optimization
+from analysis_data import read_analysis
+
+NUM_WORKERS = os.cpu_count() or 1
+
+# preview: quick low-resolution pngs in PREVIEW_DIR. final: the resolution of the paper figures, as png and
+# as pdf (vector axes and text, with the scatter layers rasterized at the same resolution).
+PREVIEW_DIR = "images/preview"
+PREVIEW_DPI = 100
+FINAL_FORMATS = ("png", "pdf")
+
+# Output path (without extension) and final dpi of every figure
+FIGURES = {
+    'languages': ("images/test", 1000),
+    'priors': ("prior_scatterplots", 1000),
+    'sums': ("images/sum_plots", 1200),
+    'prior_distances': ("images/priors_comparison", 1000),
+}
+
+def load_figure_data(figures=FIGURES):
+    """
+    Loads the data of the given figures once. Returns a dict from figure name to the arguments of its
+    draw function (see draw_figure).
+    """
+    data = {}
+    analysis = None
+    if 'languages' in figures or 'sums' in figures:
+        analysis = read_analysis(generate_plots.ANALYSIS_PATH)
+    if 'languages' in figures:
+        data['languages'] = (analysis,)
+    if 'priors' in figures:
+        data['priors'] = ([(read_analysis(file_path), title) for file_path, title in generate_prior_plots.PRIOR_PLOT_FILES],)
+    if 'sums' in figures:
+        natural_languages = analysis[analysis['type'] != 'artificial']
+        lambda_val, _ = sum_optimization.optimal_lambda(analysis['lexicon'].values, analysis['avg_ms_complexity'].values,
+                                                        natural_languages['lexicon'].values,
+                                                        natural_languages['avg_ms_complexity'].values)
+        data['sums'] = (sum_optimization.calculate_sums(analysis.copy(), lambda_val),)
+    if 'prior_distances' in figures:
+        prior_results = {prior: read_analysis(path) for prior, path in prior_significance.PRIOR_FILES.items()}
+        data['prior_distances'] = (prior_significance.calculate_all_distances(prior_results),)
+    return data
+
+def draw_figure(name, args):
+    """Draws a figure with the draw function of its script and returns it."""
+    if name == 'languages':
+        return generate_plots.plot_languages(*args)
+    if name == 'priors':
+        return generate_prior_plots.plot_priors(*args)
+    if name == 'sums':
+        return sum_optimization.plot_sums(*args)
+    if name == 'prior_distances':
+        return prior_significance.plot_distances(*args)
+    raise ValueError(f"Unknown figure {name}, expected one of {list(FIGURES)}")
+
+def render_figure(task):
+    """Worker: draws one figure and saves it to every path in the task. Returns the paths and the wall time."""
+    name, args, outputs = task
+    start = time.perf_counter()
+    fig = draw_figure(name, args)
+    for path, dpi in outputs:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return [path for path, _ in outputs], time.perf_counter() - start
+
+def figure_outputs(name, mode):
+    """Returns the (path, dpi) pairs a figure is saved to in the given mode ('preview' or 'final')."""
+    path, dpi = FIGURES[name]
+    if mode == 'preview':
+        return [(f"{PREVIEW_DIR}/{os.path.basename(path)}.png", PREVIEW_DPI)]
+    if mode == 'final':
+        return [(f"{path}.{extension}", dpi) for extension in FINAL_FORMATS]
+    raise ValueError(f"Unknown mode {mode}, expected preview or final")
+
+def render_figures(names=tuple(FIGURES), mode='preview', num_workers=NUM_WORKERS):
+    """Loads the data once and draws the named figures in num_workers processes. Returns the saved paths."""
+    data = load_figure_data(names)
+    tasks = [(name, data[name], figure_outputs(name, mode)) for name in names]
+    if num_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(tasks))) as executor:
+            results = list(executor.map(render_figure, tasks))
+    else:
+        results = [render_figure(task) for task in tasks]
+
+    paths = []
+    for name, (figure_paths, seconds) in zip(names, results):
+        print(f"{name}: {', '.join(figure_paths)} ({seconds:.2f} s)")
+        paths += figure_paths
+    return paths
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Draw the figures without a display.")
+    parser.add_argument('mode', nargs='?', choices=('preview', 'final'), default='preview',
+                        help="preview (quick pngs in images/preview/) or final (paper resolution). Default preview.")
+    parser.add_argument('figures', nargs='*', metavar='figure',
+                        help=f"figure to draw ({', '.join(FIGURES)}). Default all.")
+    args = parser.parse_args(args)
+    # Checked here, as argparse rejects an empty list of a nargs='*' positional with choices
+    for name in args.figures:
+        if name not in FIGURES:
+            parser.error(f"unknown figure {name}, expected one of {', '.join(FIGURES)}")
+    render_figures(args.figures or list(FIGURES), args.mode)
+
+if __name__ == "__main__":
+    main()
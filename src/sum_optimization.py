@@ -1,88 +1,265 @@
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.optimize import minimize
+
+from analysis_data import read_analysis, split_languages
 
 ANALYSIS_FILE = "data/language_analysis.csv"
 
-df = pd.read_csv(ANALYSIS_FILE)
-
-# Determine categories based on file structure
-natural_languages = df[df['type'] != 'artificial']
-
-MEAN_MS_COMPLEXITY = sum(natural_languages['avg_ms_complexity']) / len(natural_languages['avg_ms_complexity'])
-MEAN_LEXICON = sum(natural_languages['lexicon']) / len(natural_languages['lexicon'])
-LAMBDA = MEAN_MS_COMPLEXITY / MEAN_LEXICON
-
-nat_amsc = natural_languages['avg_ms_complexity'].values
-nat_lexicon_size = natural_languages['lexicon'].values
-
-# Objective function to minimize
-def objective_function(lambda_val):
-    global_min = min(df['avg_ms_complexity'] + lambda_val[0] * df['lexicon'])
-    sum_min = sum(nat_amsc + lambda_val[0] * nat_lexicon_size - global_min)
-    print(sum_min)
-    return sum_min
-
-initial_lambda = [0.0]
-
-# Minimize the objective function
-result = minimize(objective_function, initial_lambda)
-
-# Extract the optimal lambda and minimum S(L)
-LAMBDA = result.x[0]
-min_sum = result.fun
-
-print(f'mean ms complexity: {MEAN_MS_COMPLEXITY}, mean lexicon: {MEAN_LEXICON}, lambda: {LAMBDA}, min_sum: {min_sum}')
-
-# Calculate the 'sum' column
-df['sum'] = df['avg_ms_complexity'] + LAMBDA * df['lexicon'] 
-natural_languages = df[df['type'] != 'artificial']
-optimal_start_idx = df[df['type'] == 'artificial'].index[0]
-first_gen_indices = df[df['language'] == 'artificial_language_g0_0'].index
-first_gen_start_idx = first_gen_indices[1] if len(first_gen_indices) > 1 else first_gen_indices[0]
-
-optimal_art_langs = df.iloc[optimal_start_idx:first_gen_start_idx]
-first_gen_art_langs = df.iloc[first_gen_start_idx:]
-
-# Plot histograms
-fig, axes = plt.subplots(1, 1, figsize=(6, 3))
-
-sns.histplot(
-    natural_languages['sum'], 
-    binwidth=.02, 
-    color='red', 
-    label='Natural Languages', 
-    kde=False, 
-    alpha=0.7,
-    element="step",
-    ax=axes
-)
-sns.histplot(
-    first_gen_art_langs['sum'], 
-    binwidth=.02, 
-    color='grey', 
-    label='First Gen. Artificial Languages', 
-    kde=False, 
-    alpha=0.5,
-    element="step",
-    ax=axes
-)
-sns.histplot(
-    optimal_art_langs['sum'], 
-    binwidth=.02, 
-    color='black', 
-    label='Optimal Artificial Languages', 
-    kde=False, 
-    alpha=0.5,
-    element="step",
-    ax=axes
-)
-axes.set_xlabel("Sum")
-axes.set_ylabel("Frequency")
-axes.legend()
-plt.tight_layout()
-
-fig.savefig('images/sum_plots.png', dpi=1200)
-plt.show()
+# Bootstrap of lambda and S(L) over natural languages (see bootstrap_intervals)
+BOOTSTRAP_OUTPUT_FILE = "data/sum_bootstrap.csv"
+BOOTSTRAP_REPLICATES = 10000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 0
+
+def lower_envelope(lexicons, complexities):
+    """
+    Builds the lower envelope of the lines avg_ms_complexity + lambda * lexicon of all languages
+    (convex-hull trick). Only the lowest complexity of each lexicon size can be on the envelope, and
+    the lines on it are the vertices of the lower convex hull of the (lexicon, complexity) points.
+    Returns the lexicon sizes and complexities of those lines (by increasing lexicon size) and the
+    breakpoints (lambda values where the minimum switches from one line to the next, decreasing).
+    """
+    lexicons = np.asarray(lexicons, dtype=float)
+    complexities = np.asarray(complexities, dtype=float)
+
+    # Lowest complexity for each lexicon size
+    order = np.lexsort((complexities, lexicons))
+    lexicons, complexities = lexicons[order], complexities[order]
+    first = np.concatenate(([True], lexicons[1:] != lexicons[:-1]))
+    lexicons, complexities = lexicons[first], complexities[first]
+
+    # Lower convex hull (monotone chain) of the points, sorted by lexicon size
+    hull = []
+    for i in range(len(lexicons)):
+        while len(hull) >= 2:
+            j, k = hull[-2], hull[-1]
+            # Drop k if it is not below the segment from j to i
+            cross = ((lexicons[k] - lexicons[j]) * (complexities[i] - complexities[j])
+                     - (complexities[k] - complexities[j]) * (lexicons[i] - lexicons[j]))
+            if cross > 0:
+                break
+            hull.pop()
+        hull.append(i)
+
+    lexicons, complexities = lexicons[hull], complexities[hull]
+    breakpoints = (complexities[:-1] - complexities[1:]) / (lexicons[1:] - lexicons[:-1])
+    return lexicons, complexities, breakpoints
+
+def objective_function(lambda_val, lexicons, complexities, nat_lexicon_size, nat_amsc):
+    """
+    S(L) summed over the natural languages: the distance of their avg_ms_complexity + lambda * lexicon
+    from the lowest value of all languages. lambda_val can be a number or an array of lambdas.
+    """
+    lambdas = np.atleast_1d(np.asarray(lambda_val, dtype=float))
+    global_min = np.min(np.asarray(complexities)[None, :] + lambdas[:, None] * np.asarray(lexicons)[None, :], axis=1)
+    sum_min = nat_amsc.sum() + lambdas * nat_lexicon_size.sum() - len(nat_amsc) * global_min
+    return sum_min if np.ndim(lambda_val) else sum_min[0]
+
+def optimal_lambda(lexicons, complexities, nat_lexicon_size, nat_amsc):
+    """
+    Returns the lambda that minimises objective_function, and the minimum.
+    The objective is the linear sum over natural languages minus a multiple of the lower envelope,
+    so it is convex and piecewise linear with kinks only at the breakpoints of the envelope. Its
+    global minimum is therefore at one of them, and only those are evaluated: O(n log n) in the
+    number of languages. If the envelope is a single line, the objective is flat and 0 is returned.
+    """
+    envelope_lexicons, envelope_complexities, breakpoints = lower_envelope(lexicons, complexities)
+    if len(breakpoints) == 0:
+        return 0.0, objective_function(0.0, envelope_lexicons, envelope_complexities, nat_lexicon_size, nat_amsc)
+
+    # At each breakpoint, the envelope is given by either of the two lines that meet there
+    envelope = envelope_complexities[1:] + breakpoints * envelope_lexicons[1:]
+    sums = nat_amsc.sum() + breakpoints * nat_lexicon_size.sum() - len(nat_amsc) * envelope
+    best = np.argmin(sums)
+    return breakpoints[best], sums[best]
+
+def bootstrap_lambdas(art_lexicons, art_complexities, nat_lexicon_size, nat_amsc, num_replicates=BOOTSTRAP_REPLICATES,
+                      seed=BOOTSTRAP_SEED):
+    """
+    Resamples the natural languages with replacement num_replicates times and returns the optimal lambda of
+    every replicate and its optimum S(L*), the same as optimal_lambda on the artificial languages and the
+    natural languages drawn in the replicate. Only the natural languages that are on the envelope of the
+    artificial languages plus themselves can be on the envelope of a replicate. Replicates that draw the same
+    of those share one envelope, so it is built once per such group, and the objective of all replicates of
+    the group at its breakpoints is computed as one replicates x breakpoints matrix.
+    """
+    nat_lexicon_size = np.asarray(nat_lexicon_size, dtype=float)
+    nat_amsc = np.asarray(nat_amsc, dtype=float)
+    art_lexicons, art_complexities, _ = lower_envelope(art_lexicons, art_complexities)
+
+    # Natural languages that can be on the envelope of a replicate
+    candidates = []
+    for i in range(len(nat_amsc)):
+        envelope_lexicons, envelope_complexities, _ = lower_envelope(np.append(art_lexicons, nat_lexicon_size[i]),
+                                                                     np.append(art_complexities, nat_amsc[i]))
+        if np.any((envelope_lexicons == nat_lexicon_size[i]) & (envelope_complexities == nat_amsc[i])):
+            candidates.append(i)
+
+    # How often each natural language is drawn in each replicate
+    rng = np.random.default_rng(seed)
+    n = len(nat_amsc)
+    counts = rng.multinomial(n, np.full(n, 1.0 / n), size=num_replicates)
+    amsc_sums = counts @ nat_amsc
+    lexicon_sums = counts @ nat_lexicon_size
+
+    # Group the replicates by which candidates they draw
+    drawn = counts[:, candidates] > 0
+    patterns, pattern_ids = np.unique(drawn, axis=0, return_inverse=True)
+    pattern_ids = pattern_ids.ravel()
+
+    lambdas = np.zeros(num_replicates)
+    optima = np.zeros(num_replicates)
+    for p, pattern in enumerate(patterns):
+        rows = pattern_ids == p
+        drawn_candidates = np.asarray(candidates, dtype=int)[pattern]
+        envelope_lexicons, envelope_complexities, breakpoints = lower_envelope(
+            np.concatenate((art_lexicons, nat_lexicon_size[drawn_candidates])),
+            np.concatenate((art_complexities, nat_amsc[drawn_candidates])))
+        if len(breakpoints) == 0:
+            # A single line: the objective is flat and optimal_lambda returns 0
+            optima[rows] = envelope_complexities[0]
+            continue
+        envelope = envelope_complexities[1:] + breakpoints * envelope_lexicons[1:]
+        sums = amsc_sums[rows, None] + lexicon_sums[rows, None] * breakpoints[None, :] - n * envelope[None, :]
+        best = np.argmin(sums, axis=1)
+        lambdas[rows] = breakpoints[best]
+        optima[rows] = envelope[best]
+    return lambdas, optima
+
+def bootstrap_intervals(df, num_replicates=BOOTSTRAP_REPLICATES, confidence=BOOTSTRAP_CONFIDENCE, seed=BOOTSTRAP_SEED):
+    """
+    Bootstraps lambda over the natural languages of an analysis DataFrame. Returns a dict with the optimal
+    lambda and its percentile confidence interval, and a DataFrame with every natural language's
+    S(L) = avg_ms_complexity + lambda * lexicon and its distance from the optimum S(L*) at the optimal
+    lambda, each with its confidence interval.
+    """
+    natural_languages = df[df['type'] != 'artificial']
+    artificial_languages = df[df['type'] == 'artificial']
+    nat_amsc = natural_languages['avg_ms_complexity'].to_numpy(dtype=float)
+    nat_lexicon_size = natural_languages['lexicon'].to_numpy(dtype=float)
+    lexicons = df['lexicon'].to_numpy(dtype=float)
+    complexities = df['avg_ms_complexity'].to_numpy(dtype=float)
+
+    lambda_val, min_sum = optimal_lambda(lexicons, complexities, nat_lexicon_size, nat_amsc)
+    lambdas, replicate_optima = bootstrap_lambdas(artificial_languages['lexicon'].to_numpy(dtype=float),
+                                                  artificial_languages['avg_ms_complexity'].to_numpy(dtype=float),
+                                                  nat_lexicon_size, nat_amsc, num_replicates, seed)
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    lambda_lower, lambda_upper = np.quantile(lambdas, quantiles)
+
+    # S(L) of every natural language (columns) in every replicate (rows), and its distance from S(L*) of the replicate
+    replicate_sums = nat_amsc[None, :] + lambdas[:, None] * nat_lexicon_size[None, :]
+    sum_lower, sum_upper = np.quantile(replicate_sums, quantiles, axis=0)
+    distance_lower, distance_upper = np.quantile(replicate_sums - replicate_optima[:, None], quantiles, axis=0)
+
+    envelope_lexicons, envelope_complexities, _ = lower_envelope(lexicons, complexities)
+    sums = nat_amsc + lambda_val * nat_lexicon_size
+    optimum = np.min(envelope_complexities + lambda_val * envelope_lexicons)
+    language_sums = pd.DataFrame({
+        'language': natural_languages['language'].to_numpy(),
+        'sum': sums,
+        'sum_lower': sum_lower,
+        'sum_upper': sum_upper,
+        'distance': sums - optimum,
+        'distance_lower': distance_lower,
+        'distance_upper': distance_upper,
+    })
+    lambda_interval = {'lambda': float(lambda_val), 'min_sum': float(min_sum), 'lambda_lower': float(lambda_lower),
+                       'lambda_upper': float(lambda_upper), 'replicates': num_replicates, 'confidence': confidence}
+    return lambda_interval, language_sums
+
+def calculate_sums(df, lambda_val):
+    """Adds the 'sum' column (avg_ms_complexity + lambda * lexicon) to the analysis DataFrame."""
+    df['sum'] = df['avg_ms_complexity'] + lambda_val * df['lexicon']
+    return df
+
+def plot_sums(df):
+    """Plots histograms of the sums of natural, first generation and optimal artificial languages."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    natural_languages, optimal_art_langs, first_gen_art_langs = split_languages(df)
+
+    # Plot histograms
+    fig, axes = plt.subplots(1, 1, figsize=(6, 3))
+
+    sns.histplot(
+        natural_languages['sum'],
+        binwidth=.02,
+        color='red',
+        label='Natural Languages',
+        kde=False,
+        alpha=0.7,
+        element="step",
+        ax=axes
+    )
+    sns.histplot(
+        first_gen_art_langs['sum'],
+        binwidth=.02,
+        color='grey',
+        label='First Gen. Artificial Languages',
+        kde=False,
+        alpha=0.5,
+        element="step",
+        ax=axes
+    )
+    sns.histplot(
+        optimal_art_langs['sum'],
+        binwidth=.02,
+        color='black',
+        label='Optimal Artificial Languages',
+        kde=False,
+        alpha=0.5,
+        element="step",
+        ax=axes
+    )
+    axes.set_xlabel("Sum")
+    axes.set_ylabel("Frequency")
+    axes.legend()
+    plt.tight_layout()
+    return fig
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Find the optimal lambda of S(L), or bootstrap its confidence "
+                                                 "interval.")
+    parser.add_argument('mode', nargs='?', choices=('plot', 'bootstrap'), default='plot',
+                        help=f"plot the sums (default), or bootstrap writes confidence intervals to "
+                             f"{BOOTSTRAP_OUTPUT_FILE} instead")
+    parser.add_argument('replicates', nargs='?', type=int,
+                        help=f"number of bootstrap replicates (default {BOOTSTRAP_REPLICATES})")
+    args = parser.parse_args(args)
+    if args.mode != 'bootstrap' and args.replicates is not None:
+        parser.error("replicates can only be given with bootstrap")
+    import matplotlib.pyplot as plt
+    df = read_analysis(ANALYSIS_FILE)
+
+    if args.mode == 'bootstrap':
+        num_replicates = BOOTSTRAP_REPLICATES if args.replicates is None else args.replicates
+        lambda_interval, language_sums = bootstrap_intervals(df, num_replicates)
+        print(lambda_interval)
+        language_sums.to_csv(BOOTSTRAP_OUTPUT_FILE, index=False)
+        return
+
+    # Determine categories based on file structure
+    natural_languages = df[df['type'] != 'artificial']
+
+    MEAN_MS_COMPLEXITY = sum(natural_languages['avg_ms_complexity']) / len(natural_languages['avg_ms_complexity'])
+    MEAN_LEXICON = sum(natural_languages['lexicon']) / len(natural_languages['lexicon'])
+
+    nat_amsc = natural_languages['avg_ms_complexity'].values
+    nat_lexicon_size = natural_languages['lexicon'].values
+
+    # Extract the optimal lambda and minimum S(L)
+    LAMBDA, min_sum = optimal_lambda(df['lexicon'].values, df['avg_ms_complexity'].values, nat_lexicon_size, nat_amsc)
+
+    print(f'mean ms complexity: {MEAN_MS_COMPLEXITY}, mean lexicon: {MEAN_LEXICON}, lambda: {LAMBDA}, min_sum: {min_sum}')
+
+    # Calculate the 'sum' column
+    calculate_sums(df, LAMBDA)
+    fig = plot_sums(df)
+
+    fig.savefig('images/sum_plots.png', dpi=1200)
+    plt.show()
+
+if __name__ == "__main__":
+    main()
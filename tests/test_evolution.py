@@ -0,0 +1,33 @@
+import os
+import shutil
+
+import pandas as pd
+
+import artificial_language_evolution
+import hurford_grammar
+from grammar import read_grammars
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def test_evolve_islands_keeps_every_first_generation_language(tmp_path, monkeypatch):
+    # The scripts read and write data/ relative to the working directory
+    os.makedirs(tmp_path / "data")
+    shutil.copy(os.path.join(DATA_DIR, "natural_language_grammars.csv"), tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hurford_grammar, 'USE_CACHE', False)
+
+    artificial_language_evolution.evolve_islands(num_islands=2, num_generations=3, migration_interval=1)
+
+    first_gen = {grammar.language for grammar in read_grammars(artificial_language_evolution.FIRST_GEN_ART_LANG_FILE)}
+    analysis = pd.read_csv(artificial_language_evolution.COMPLEXITY_OUTPUT_FILE)
+    constructions = pd.read_csv(hurford_grammar.HURFORD_OUTPUT_FILE)
+
+    analysed = set(analysis.loc[analysis['category'] == 'first_gen_artificial', 'language'])
+    assert analysed == first_gen
+    assert (analysis['category'] == 'first_gen_artificial').sum() == len(first_gen)
+    assert first_gen <= set(constructions['language'])
+    # The first generation rows come after the merged population and the natural languages
+    survivors = {grammar.language for grammar in read_grammars(artificial_language_evolution.ARTIFICIAL_LANGUAGE_FILE)}
+    counts = constructions['language'].value_counts()
+    for language in first_gen:
+        assert counts[language] == len(hurford_grammar.NUMBERS) * (2 if language in survivors else 1)
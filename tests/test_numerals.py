@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from numerals import COMMANDS, STATS
+
+NUMERALS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "numerals.py")
+
+SUBCOMMANDS = [[command] for command in COMMANDS] + [['stats', analysis] for analysis in STATS]
+
+def run_numerals(args, cwd):
+    # An empty working directory has no data files, so a script that ignores its arguments fails
+    env = dict(os.environ, MPLBACKEND="Agg")
+    return subprocess.run([sys.executable, NUMERALS] + args, cwd=cwd, env=env, capture_output=True, text=True,
+                          timeout=120)
+
+@pytest.mark.parametrize('subcommand', SUBCOMMANDS, ids=' '.join)
+def test_help(subcommand, tmp_path):
+    result = run_numerals(subcommand + ['--help'], tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("usage:")
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.parametrize('args', [
+    ['construct'],
+    ['construct', '2'],
+    ['generate'],
+    ['generate', 'x'],
+    ['analyse', 'nope'],
+    ['plot', 'draft'],
+    ['plot', 'final', 'nope'],
+    ['stats', 'sums', 'bootstrap', 'x'],
+    ['stats', 'sums', 'plot', '10'],
+    ['stats', 'priors', 'Power-law'],
+    ['stats', 'priors', 'Power-law=missing.csv'],
+    ['stats', 'sweep', '0', 'x'],
+    ['stats', 'sweep', 'missing.csv'],
+    ['stats', 'sweep', '0', '1', '0.5', '2'],
+    ['stats', 'frontier', 'x'],
+], ids=' '.join)
+def test_bad_arguments(args, tmp_path):
+    result = run_numerals(args, tmp_path)
+    assert result.returncode == 2
+    assert "usage:" in result.stderr and "Traceback" not in result.stderr